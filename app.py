@@ -7,6 +7,8 @@ if (sys.version_info.major < 3 or sys.version_info.minor < 6):
 # coding=utf-8
 import datetime
 import collections
+import functools
+import gc
 import hedy
 import json
 import logging
@@ -32,7 +34,7 @@ from flask_compress import Compress
 # Hedy-specific modules
 import courses
 import hedyweb
-from website import querylog, aws_helpers, jsonbin, translating, ab_proxying, cdn, database
+from website import querylog, aws_helpers, jsonbin, translating, ab_proxying, cdn, database, warmup, yaml_file
 
 # Set the current directory to the root Hedy folder
 os.chdir(os.path.join (os.getcwd (), __file__.replace (os.path.basename (__file__), '')))
@@ -72,6 +74,12 @@ TRANSLATIONS = hedyweb.Translations()
 
 DATABASE = database.Database()
 
+WARMUP = warmup.Warmup()
+
+hedy.TRANSPILE_TIMEOUT = config['transpile-timeout']
+hedy.TRANSPILE_CACHE.resize(int(config['transpile-cache-mb'] * 1024 * 1024))
+hedy.COUNTER_CALLBACK = querylog.log_counter
+
 def load_adventures_in_all_languages():
     adventures = {}
     for lang in ALL_LANGUAGES.keys ():
@@ -167,6 +175,13 @@ def before_request_proxy_testing():
         if os.getenv ('IS_TEST_ENV'):
             session ['test_session'] = 'test'
 
+if config['warmup']['hold-traffic']:
+    @app.before_request
+    def hold_traffic_until_warm():
+        # the readiness check itself should answer right away
+        if request.path != '/ready':
+            WARMUP.wait(config['warmup']['hold-timeout'])
+
 # HTTP -> HTTPS redirect
 # https://stackoverflow.com/questions/32237379/python-flask-redirect-to-https-from-http/32238093
 if os.getenv ('REDIRECT_HTTP_TO_HTTPS'):
@@ -305,14 +320,13 @@ def parse():
         else:
             response["Code"] = "# coding=utf8\nimport random\n" + python_code
 
+    # most programs that kids run have a mistake in them, these are not errors of the
+    # server so we don't print their tracebacks
     except hedy.InvalidSpaceException as ex:
-        traceback.print_exc()
         response = invalid_space_error_to_response(ex, hedy_errors)
     except hedy.ParseException as ex:
-        traceback.print_exc()
         response = parse_error_to_response(ex, hedy_errors)
     except hedy.HedyException as ex:
-        traceback.print_exc()
         response = hedy_error_to_response(ex, hedy_errors)
 
     except Exception as E:
@@ -392,6 +406,12 @@ def report_client_exception():
     # Return a 500 so the HTTP status codes will stand out in our monitoring/logging
     return 'logged', 500
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Report the progress of the warm-up of this worker, with status 503 until it is done."""
+    status = WARMUP.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/version', methods=['GET'])
 def version_page():
     """
@@ -1116,7 +1136,36 @@ def on_server_start():
 
     Use this to initialize objects, dependencies and connections.
     """
-    pass
+    # in preload mode the gunicorn master has done the warm-up before forking, see on_preload
+    if WARMUP.started_at is None:
+        add_warmup_tasks()
+        WARMUP.start()
+
+
+def on_preload():
+    """Called in the gunicorn master in preload mode, before the workers are forked.
+
+    The master does the warm-up, so all workers share its parsers and course
+    data (copy-on-write) instead of each building their own. gc.freeze() moves
+    all objects out of reach of the garbage collector, which would otherwise
+    write to them, and so copy the pages they are on, in every worker.
+    """
+    if WARMUP.started_at is None:
+        add_warmup_tasks()
+        WARMUP.start().join()
+    gc.freeze()
+
+
+def add_warmup_tasks():
+    # the YAML files most pages need (texts, level defaults, courses and adventures)
+    # the parsers of all levels and the prebaked transpilations, see WARMUP
+    load_adventures_in_all_languages()
+    for filename, yaml in sorted(yaml_file.YAML_FILES_CACHE.items()):
+        if yaml.exists():
+            WARMUP.add(filename, yaml.access)
+    for level in range(1, hedy.HEDY_MAX_LEVEL + 1):
+        WARMUP.add(f'parser level {level}', functools.partial(hedy.get_parser, level))
+    WARMUP.add('prebaked transpilations', hedy.load_prebaked_transpilations)
 
 
 if __name__ == '__main__':
@@ -1129,6 +1178,10 @@ if __name__ == '__main__':
     # subprocesses which make debugging harder.
     is_in_debugger = sys.gettrace() is not None
 
+    # Write the merged grammars to grammars-Total, to ease debugging
+    if utils.is_debug_mode():
+        hedy.save_total_grammar_files()
+
     on_server_start()
 
     # Threaded option enables multiple instances for multiple user access support
@@ -0,0 +1,282 @@
+"""Report what the grammar of every level costs the parser, so a grammar edit can be judged before it is merged.
+
+For every level we parse a corpus of programs (the code of the English
+adventures and level defaults, and the programs of a batchhedy directory
+like the one fuzzhedy.py writes) with an Earley parser that keeps all the
+ways it read a program, and report:
+
+- the parse cost of every rule: the Earley items the parser made for it, as
+  a part of all items. Every item is work, also for the ways of reading a
+  program that lose in the end, like the catch-all invalid rules;
+- ambiguous derivations: parts of a program that can be read in more than
+  one way, like a command that is both a print and an invalid line;
+- overlapping terminals: keywords and texts of the corpus that more than one
+  terminal matches, so the parser has to try all of them;
+- rules that no program of the corpus uses;
+- the rules that keep the grammar from being LALR(1), whatever parser mode
+  the level runs in (see hedy.PARSER_MODES).
+
+    python auditgrammars.py --levels 1 5 --save before.json
+    (edit the grammar)
+    python auditgrammars.py --levels 1 5 --compare before.json
+"""
+import argparse
+import collections
+import contextlib
+import glob
+import json
+import time
+from os import path
+
+import regex
+from lark import Lark
+from lark.exceptions import LarkError
+from lark.lexer import PatternStr, Token
+from lark.parsers import earley
+
+import hedy
+from fuzzhedy import rule_base
+from prebake import coursedata_snippets
+
+# how many rules, ambiguities and overlaps we show per level
+TOP = 10
+
+
+class LevelAudit:
+    """What parsing the corpus of one level cost, and which rules and terminals it used."""
+
+    def __init__(self, level):
+        self.level = level
+        self.programs = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.items = collections.Counter()
+        self.used = set()
+        self.rules = set()
+        self.ambiguities = collections.Counter()
+        self.ambiguous_programs = 0
+        self.examples = {}
+        self.overlaps = collections.defaultdict(dict)
+        self.unused = []
+        self.lalr_conflicts = []
+
+    def to_json(self):
+        return {
+            'programs': self.programs,
+            'errors': self.errors,
+            'seconds': self.seconds,
+            'items': dict(self.items),
+            'ambiguous_programs': self.ambiguous_programs,
+            'ambiguities': dict(self.ambiguities),
+            'unused': self.unused,
+            'lalr_conflicts': self.lalr_conflicts,
+        }
+
+
+@contextlib.contextmanager
+def counting_items(counter):
+    """Count the Earley items the parser makes per rule while in this block.
+
+    Lark has no hook for this, so we swap in a subclass of its Item that counts.
+    """
+    original = earley.Item
+
+    class CountingItem(original):
+        __slots__ = ()
+
+        def __init__(self, rule, ptr, start):
+            counter[rule.origin.name] += 1
+            original.__init__(self, rule, ptr, start)
+
+        def advance(self):
+            return CountingItem(self.rule, self.ptr + 1, self.start)
+
+    earley.Item = CountingItem
+    try:
+        yield
+    finally:
+        earley.Item = original
+
+
+def coursedata_programs(language='en'):
+    """The code in the adventures and level defaults of a language, as (level, code) tuples."""
+    return [(snippet.level, snippet.code) for snippet in coursedata_snippets([language]) if snippet.checked]
+
+
+def corpus_programs(directory):
+    """The programs in a directory of .hedy files in the format of batchhedy, as (level, code) tuples."""
+    programs = []
+    for filename in sorted(glob.glob(path.join(directory, '*.hedy'))):
+        with open(filename, encoding='utf-8') as f:
+            lines = f.readlines()
+        programs.append((int(lines[0].split('=')[-1].split()[-1]), ''.join(lines[4:])))
+    return programs
+
+
+def parser_text(code, level):
+    """The text the parser of a level gets for a program, or None if it does not get that far."""
+    try:
+        return hedy.preprocess_program(hedy.normalise_program(code), level) + '\n'
+    except hedy.HedyException:
+        return None
+
+
+def audit_level(level, programs):
+    """Parse the programs of a level, returns a LevelAudit."""
+    grammar = hedy.create_grammar(level)
+    parser = Lark(grammar, regex=True, ambiguity='forest', keep_all_tokens=True)
+    audit = LevelAudit(level)
+    audit.rules = {rule_base(rule.origin.name) for rule in parser.rules} - {'start'}
+    terminals = {t.name: t for t in parser.terminals}
+    names = terminal_names(parser)
+    tokens = set()
+
+    for code in programs:
+        text = parser_text(code, level)
+        if text is None:
+            continue
+        audit.programs += 1
+        start = time.perf_counter()
+        try:
+            with counting_items(audit.items):
+                root = parser.parse(text)
+        except LarkError:
+            audit.errors += 1
+            continue
+        finally:
+            audit.seconds += time.perf_counter() - start
+        if walk_forest(root, text, audit, tokens):
+            audit.ambiguous_programs += 1
+
+    audit.unused = sorted(audit.rules - audit.used)
+    audit.overlaps = overlapping_terminals(terminals, names, tokens)
+    audit.lalr_conflicts = hedy.lalr_conflicts(grammar)
+    return audit
+
+
+def walk_forest(root, text, audit, tokens):
+    """Note the rules, ambiguities and texts of the tokens of a parse forest. Returns whether the program is ambiguous."""
+    ambiguous = False
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Token):
+            tokens.add(node.value)
+            continue
+        if node is None or node in seen:
+            continue
+        seen.add(node)
+        children = node.children
+        if node.is_ambiguous and not node.is_intermediate:
+            ambiguous = True
+            key = ambiguity_key(children)
+            audit.ambiguities[key] += 1
+            audit.examples.setdefault(key, text[node.start:node.end])
+        for packed in children:
+            audit.used.add(rule_base(packed.rule.origin.name))
+            stack.append(packed.left)
+            stack.append(packed.right)
+    return ambiguous
+
+
+def ambiguity_key(children):
+    # the ways a part of the program can be read: 'command: print | invalid'
+    rule = rule_base(children[0].rule.origin.name)
+    ways = sorted({' '.join(s.name for s in packed.rule.expansion) for packed in children})
+    if len(ways) == 1:
+        return f'{rule}: {ways[0]} (split in more than one way)'
+    return f'{rule}: ' + ' | '.join(ways)
+
+
+def terminal_names(parser):
+    """Readable names for the terminals: anonymous ones are named after the rule that is only them."""
+    names = {t.name: t.name for t in parser.terminals}
+    for rule in parser.rules:
+        expansion = rule.expansion
+        if len(expansion) == 1 and expansion[0].name.startswith('__ANON'):
+            names[expansion[0].name] = rule.origin.name
+    return names
+
+
+def overlapping_terminals(terminals, names, texts):
+    """For every terminal, the terminals that match a text it matches too, with an example of such a text."""
+    compiled = {name: regex.compile(t.pattern.to_regexp(), flags=regex.I if 'i' in t.pattern.flags else 0)
+                for name, t in terminals.items()}
+    # besides the texts of the corpus, every keyword is a text we want a single terminal for
+    texts = set(texts) | {t.pattern.value for t in terminals.values() if isinstance(t.pattern, PatternStr)}
+
+    overlaps = collections.defaultdict(dict)
+    for text in sorted(texts):
+        matching = {names[name] for name, pattern in compiled.items() if pattern.fullmatch(text)}
+        for name in matching:
+            for other in matching - {name}:
+                overlaps[name].setdefault(other, text)
+    return overlaps
+
+
+def print_audit(audit, previous=None):
+    total = sum(audit.items.values())
+    parser_mode = hedy.get_parser_mode(audit.level)
+    print(f'Level {audit.level} ({parser_mode}): {audit.programs} programs, {audit.errors} not valid, '
+          f'{audit.seconds:.2f}s, {total} Earley items' + compared(audit, previous))
+
+    print('  parse cost per rule (part of the Earley items):')
+    per_rule = collections.Counter()
+    for name, count in audit.items.items():
+        per_rule[rule_base(name)] += count
+    for rule, count in per_rule.most_common(TOP):
+        print(f'    {rule:25} {100 * count / max(total, 1):5.1f}%')
+
+    print(f'  ambiguous programs: {audit.ambiguous_programs}')
+    for key, count in audit.ambiguities.most_common(TOP):
+        print(f'    {count:5}x {key}   e.g. {audit.examples[key]!r}')
+
+    print('  overlapping terminals:')
+    for name, others in sorted(audit.overlaps.items(), key=lambda item: -len(item[1]))[:TOP]:
+        examples = ', '.join(f'{text!r} ({other})' for other, text in list(others.items())[:5])
+        more = f' and {len(others) - 5} more' if len(others) > 5 else ''
+        print(f'    {name} also matches {examples}{more}')
+
+    print(f'  rules not used by the corpus: {", ".join(audit.unused) or "none"}')
+    print(f'  LALR conflicts: {", ".join(audit.lalr_conflicts) or "none"}')
+
+
+def compared(audit, previous):
+    if previous is None or str(audit.level) not in previous:
+        return ''
+    before = sum(previous[str(audit.level)]['items'].values())
+    after = sum(audit.items.values())
+    return f' ({100 * after / max(before, 1):.1f}% of the {before} items before)'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the parse cost, ambiguities and overlapping terminals of the grammars.')
+    parser.add_argument('--levels', type=int, nargs='+', default=range(1, hedy.HEDY_MAX_LEVEL + 1))
+    parser.add_argument('--corpus', help='a directory of .hedy files in the format of batchhedy, to add to the coursedata')
+    parser.add_argument('--language', default='en', help='the language of the coursedata programs')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare the number of Earley items with a JSON file written by --save')
+    args = parser.parse_args()
+
+    programs = coursedata_programs(args.language)
+    if args.corpus:
+        programs += corpus_programs(args.corpus)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+
+    results = {}
+    for level in args.levels:
+        audit = audit_level(level, [code for program_level, code in programs if program_level == level])
+        print_audit(audit, previous)
+        results[str(level)] = audit.to_json()
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ from time import perf_counter
 from typing import Optional, List, Tuple, ClassVar
 import csv
 import os
+import sys
 from os import path
 import glob
 
@@ -14,15 +15,20 @@ from pydantic import BaseModel, FilePath
 from lark.exceptions import GrammarError, UnexpectedEOF
 from lazy.lazy import lazy
 
-def run(filenames, report, top, check = None, ):
+def run(filenames, report, top, check = None, workers = None):
         jobs = create_jobs(filenames)
         #skip empty programs
         jobs = [j for j in jobs if not is_empty(j.code)]
 
         number_of_error_programs = 0
 
+        # with workers, all jobs are transpiled upfront on a pool of processes
+        if workers is not None:
+            transpile_in_parallel(jobs, workers)
+
         for job in jobs:
-            job.transpile()
+            if workers is None:
+                job.transpile()
             if job.error_msg != '':
                 number_of_error_programs += 1
 
@@ -92,6 +98,13 @@ def create_jobs(filenames):
 
     return jobs
 
+def transpile_in_parallel(jobs, workers):
+    """ Transpile the jobs on `workers` processes (0 for all CPUs) """
+    jobs_to_run = [j for j in jobs if not j.error]
+    results = hedy.transpile_many(((j.code, j.level) for j in jobs_to_run), workers=workers or None)
+    for result in results:
+        jobs_to_run[result.index].set_result(result)
+
 def create_checkdata(check):
     """ Data of a previous run. Return None is self.check is not set."""
     if check is None:
@@ -193,6 +206,13 @@ class TranspileJob:
         self.transpile_time = t2 - t1
         return pycode
 
+    def set_result(self, result):
+        """ Store the outcome of a job that was transpiled by hedy.transpile_many """
+        self.transpile_time = result.transpile_time
+        if result.error is not None:
+            self.error = True
+            self.error_msg = str(result.error)
+
     @lazy
     def code(self) -> str:
         """ The hedy code"""
@@ -265,7 +285,15 @@ filenames_list = glob.glob('../../input_small/*.hedy')
 #check determines if we are comparing against an existing report
 
 if __name__ == '__main__':
+    report_name = 'output_report_small.csv'
+    # a directory of programs can be given instead, like the corpus of fuzzhedy.py:
+    #   python batchhedy.py fuzz
+    if len(sys.argv) > 1:
+        filenames_list = glob.glob(path.join(sys.argv[1], '*.hedy'))
+        report_name = f'output_report_{path.basename(path.normpath(sys.argv[1]))}.csv'
+
     if len(filenames_list) == 0:
         print("no files found!")
     else:
-        run(filenames=filenames_list, check = 'output_report_small.csv', report = 'output_report_small.csv', top=10)
+        check = report_name if path.exists(report_name) else None
+        run(filenames=filenames_list, check = check, report = report_name, top=10)
@@ -37,4 +37,13 @@ config = {
     #enables the quiz environment by setting the config variable on True
     'quiz-enabled': True,
     'quiz-max-attempts': 3,
+    'warmup': {
+        # let requests wait (for at most hold-timeout seconds) until the worker has warmed up
+        'hold-traffic': bool(os.getenv('WARMUP_HOLD_TRAFFIC')),
+        'hold-timeout': 30,
+    },
+    # seconds a program may take to transpile, see hedy.TRANSPILE_TIMEOUT
+    'transpile-timeout': float(os.getenv('TRANSPILE_TIMEOUT', 10)),
+    # megabytes the transpile cache of every worker may use, see hedy.TRANSPILE_CACHE
+    'transpile-cache-mb': float(os.getenv('TRANSPILE_CACHE_MB', 16)),
 }
@@ -0,0 +1,343 @@
+"""Generate random Hedy programs from the grammar of a level, to find programs that are slow to transpile.
+
+The generator reads the merged grammar of a level (see hedy.create_grammar),
+and builds programs by picking random expansions of its rules, so every
+command of a level gets tried, also in combinations nobody writes by hand.
+Near-valid programs are valid programs with a small mistake in them (a missing
+character, a wrong indentation), which are interesting because the parser
+tries hardest before it gives up on a program.
+
+The slowest programs of every level are written to a directory in the format
+of batchhedy, which can run them again to see whether a change to the
+grammars or the transpiler made them faster:
+
+    python fuzzhedy.py --levels 1 8 17 --programs 200 --lines 20
+    cd batchhedy && python batchhedy.py fuzz
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+from os import path
+
+import regex
+from lark.lexer import PatternStr
+from lark.load_grammar import load_grammar
+
+import hedy
+
+# rules that only exist to give an error about a line
+INVALID_RULES = {'invalid', 'invalid_space'}
+
+INDENT = '    '
+
+# we pick the text of regular expression terminals (names, numbers, texts) from these
+WORDS = [
+    'hallo', 'Hedy', 'naam', 'dier', 'kleur', 'x', 'i', 'ja', 'nee', 'hond', 'kat',
+    'Ölçü', 'niño', 'اسم', '名字', '5', '12', '0', '-3', '100',
+    "'hallo'", "'hallo wereld'", "'It\\'s'", "''",
+    'hallo wereld', 'wat is je naam', 'ik ben Hedy', ':', '!', '?', '.',
+]
+
+# the characters a mutation inserts into a near-valid program
+MUTATION_CHARACTERS = " '\n:,=+*()[]"
+
+# the most nested rules we expand before we only take the shortest ways out
+MAX_RECURSION = 40
+
+# how likely an alternative of a rule is picked, compared to the 1 of most alternatives:
+# one that repeats lines, once for every repetition in it
+GROWTH = 4
+# one that expands a rule we are already expanding, like the sum in 'sum: sum _ADD product'
+RECURSION_WEIGHT = 0.5
+# one that is only keywords, like 'print: _PRINT'
+KEYWORD_ONLY_WEIGHT = 0.1
+
+
+class ProgramGenerator:
+    """Builds random programs for a level, that grow to about `lines` lines with at most `depth` nested blocks."""
+
+    def __init__(self, level, lines=10, depth=3, rng=None):
+        self.level = level
+        self.lines = lines
+        self.depth = depth
+        self.rng = rng or random.Random()
+
+        grammar, _ = load_grammar(hedy.create_grammar(level), f'level{level}', [], False)
+        terminals, rules, _ = grammar.compile(['program'], set())
+        self.terminals = {t.name: t.pattern for t in terminals}
+        self.rules = {}
+        for rule in rules:
+            self.rules.setdefault(rule.origin.name, []).append([s.name for s in rule.expansion])
+        self.words = {name: self._matching_words(pattern) for name, pattern in self.terminals.items()
+                      if not isinstance(pattern, PatternStr)}
+        self.costs = self._costs()
+        self.line_helpers = self._line_helpers()
+        # rules of a block, their commands are indented one level deeper than the rule itself
+        self.block_rules = {rule_base(name) for name, alternatives in self.rules.items()
+                            if any('_END_BLOCK' in a for a in alternatives)}
+
+    def generate(self, valid=True):
+        """A random program, near-valid unless `valid`."""
+        self.valid = valid
+        self.output = []
+        self.eols = 0
+        self.stack = []
+        self._expand('program', 0)
+        lines = ''.join(self.output).split('\n')
+        program = '\n'.join(line for line in lines if line.strip() != '_END_BLOCK_')
+        return program if valid else mutate(program, self.rng)
+
+    def _expand(self, name, depth):
+        if name in self.terminals:
+            self.output.append(self._terminal(name, depth))
+            return
+
+        self.stack.append(name)
+        alternatives = self.rules[name]
+        repeated = [a[1:] for a in alternatives if a[:1] == [name]]
+        if name.startswith('__') and repeated:
+            # lark makes 'x*' into '__rule_star_0: x | __rule_star_0 x', which we expand
+            # x by x, so we can stop repeating when the program is big enough
+            first = [a for a in alternatives if a[:1] != [name]]
+            self._expand_symbols(name, self._choose(name, first, depth), depth)
+            while self._repeat(name):
+                self._expand_symbols(name, self._choose(name, repeated, depth), depth)
+        else:
+            self._expand_symbols(name, self._choose(name, alternatives, depth), depth)
+        self.stack.pop()
+
+    def _expand_symbols(self, name, expansion, depth):
+        block = rule_base(name) in self.block_rules
+        for i, symbol in enumerate(expansion):
+            next_symbol = expansion[i + 1] if i + 1 < len(expansion) else None
+            if block and symbol == '_SPACE' and next_symbol == 'command' and self._at_start_of_line():
+                # a command of the block, the indentation of the line moves one level in
+                self._indent(depth + 1)
+            elif block and symbol == 'command':
+                self._expand(symbol, depth + 1)
+            else:
+                self._expand(symbol, depth)
+
+    def _big_enough(self):
+        return self.eols >= self.lines or len(self.stack) > MAX_RECURSION
+
+    def _repeat(self, name):
+        if self._big_enough():
+            return False
+        weight = 1 + GROWTH if name in self.line_helpers else RECURSION_WEIGHT
+        return self.rng.random() < weight / (1 + weight)
+
+    def _choose(self, name, alternatives, depth):
+        allowed = [a for a in alternatives if self._allowed(a, depth)] or alternatives
+        if self._big_enough():
+            # the program is big enough, take the shortest way out, that is not an incomplete command
+            if not name.startswith('__'):
+                allowed = [a for a in allowed if any(is_content(s) for s in a)] or allowed
+            cheapest = min(self._cost(a) for a in allowed)
+            allowed = [a for a in allowed if self._cost(a) == cheapest]
+            return self.rng.choice(allowed)
+        weights = [self._weight(name, a) for a in allowed]
+        recursive = [a for a in allowed if self._recursive(a)]
+        if recursive:
+            # a longer sum or another condition, these would go on forever
+            weights = [RECURSION_WEIGHT / len(recursive) if self._recursive(a) else w for a, w in zip(allowed, weights)]
+        return self.rng.choices(allowed, weights)[0]
+
+    def _weight(self, name, expansion):
+        lines = sum(1 for s in expansion if s in self.line_helpers)
+        if lines:
+            return 1 + GROWTH * lines
+        if not name.startswith('__') and not any(is_content(s) for s in expansion):
+            # a print or turn without anything to print or turn is an error
+            return KEYWORD_ONLY_WEIGHT
+        return 1
+
+    def _recursive(self, expansion):
+        return any(symbol in self.stack for symbol in expansion)
+
+    def _allowed(self, expansion, depth):
+        if self.valid and any(symbol in INVALID_RULES for symbol in expansion):
+            return False
+        if depth >= self.depth and any(rule_base(symbol) in self.block_rules for symbol in expansion):
+            return False
+        return True
+
+    def _terminal(self, name, depth):
+        if name == '_EOL':
+            self.eols += 1
+            return '\n'
+        if name == '_END_BLOCK':
+            # the preprocessor adds these lines at the end of a block, the program does not contain them
+            return '_END_BLOCK_'
+        if self._at_start_of_line():
+            # like the 'else' of an if, a line in a block is indented as deep as the block
+            self._indent(depth)
+            if name == '_SPACE':
+                return ''
+        if name == '_SPACE':
+            return ' '
+        pattern = self.terminals[name]
+        if isinstance(pattern, PatternStr):
+            return pattern.value
+        words = self.words[name]
+        if not words:
+            raise ValueError(f'No text for terminal {name}: /{pattern.value}/')
+        return self.rng.choice(words)
+
+    def _at_start_of_line(self):
+        for text in reversed(self.output):
+            if text.strip(' '):
+                return text.endswith('\n')
+        return True
+
+    def _indent(self, depth):
+        # pad the spaces at the start of the current line up to the indentation of depth
+        spaces = 0
+        for text in reversed(self.output):
+            if text.strip(' '):
+                break
+            spaces += len(text)
+        self.output.append(' ' * max(0, len(INDENT) * depth - spaces))
+
+    def _matching_words(self, pattern):
+        compiled = regex.compile(pattern.to_regexp())
+        return [w for w in WORDS if compiled.fullmatch(w)]
+
+    def _cost(self, expansion):
+        return sum(self.costs.get(symbol, 1) for symbol in expansion)
+
+    def _costs(self):
+        # the least number of terminals a rule can make, so we know the shortest ways out
+        costs = {name: 1 for name in self.terminals}
+        changed = True
+        while changed:
+            changed = False
+            for name, alternatives in self.rules.items():
+                cost = min((sum(costs.get(s, float('inf')) for s in a) for a in alternatives), default=0)
+                if cost < costs.get(name, float('inf')):
+                    costs[name] = cost
+                    changed = True
+        return costs
+
+    def _line_helpers(self):
+        # rules lark made for a repetition of lines, like the (_EOL _SPACE command)* of a block
+        helpers = set()
+        for name, alternatives in self.rules.items():
+            if name.startswith('__') and any('command' in a for a in alternatives):
+                helpers.add(name)
+        return helpers
+
+
+def rule_base(name):
+    """The name of the rule in the grammar file, for the rules lark makes for repetitions (__ifs_star_1 -> ifs)."""
+    if name.startswith('__'):
+        return name[2:].rsplit('_', 2)[0]
+    return name
+
+
+def is_content(symbol):
+    """Whether a symbol ends up in the program as more than a keyword or a space."""
+    return not symbol.startswith('_') or symbol.startswith('__')
+
+
+def mutate(program, rng):
+    """Make a small mistake in a program."""
+    if not program:
+        return program
+    lines = program.split('\n')
+    mutation = rng.choice(['delete', 'insert', 'duplicate', 'indent'])
+    if mutation == 'duplicate':
+        i = rng.randrange(len(lines))
+        lines.insert(i, lines[i])
+        return '\n'.join(lines)
+    if mutation == 'indent':
+        i = rng.randrange(len(lines))
+        lines[i] = rng.choice(['', ' ', INDENT + INDENT]) + lines[i].lstrip(' ')
+        return '\n'.join(lines)
+    i = rng.randrange(len(program))
+    if mutation == 'delete':
+        return program[:i] + program[i + 1:]
+    return program[:i] + rng.choice(MUTATION_CHARACTERS) + program[i:]
+
+
+class FuzzResult:
+    """The outcome of transpiling one generated program."""
+
+    def __init__(self, level, code, seconds, error):
+        self.level = level
+        self.code = code
+        self.seconds = seconds
+        self.error = error
+
+
+def time_transpile(code, level, timeout=None):
+    """Transpile a program without the cache, returns a FuzzResult."""
+    error = None
+    start = time.perf_counter()
+    try:
+        with hedy.transpile_deadline(timeout):
+            hedy.transpile_uncached(code, level)
+    except Exception as ex:
+        error = type(ex).__name__
+    return FuzzResult(level, code, time.perf_counter() - start, error)
+
+
+def fuzz_level(level, programs, lines=10, depth=3, near_valid=0.3, seed=None, timeout=None):
+    """Generate and transpile `programs` programs for a level, returns their FuzzResults, slowest first."""
+    rng = random.Random(seed)
+    generator = ProgramGenerator(level, lines=lines, depth=depth, rng=rng)
+    # build the parsers first, also those of the levels below that we look for the right level with,
+    # or the first program would take the time it takes to build them
+    for lower in range(max(1, level - hedy.WRONG_LEVEL_SEARCH_DEPTH), level + 1):
+        hedy.get_parser(lower)
+    results = []
+    for _ in range(programs):
+        code = generator.generate(valid=rng.random() >= near_valid)
+        results.append(time_transpile(code, level, timeout))
+    results.sort(key=lambda r: r.seconds, reverse=True)
+    return results
+
+
+def write_corpus(results, directory, seed):
+    """Write the results as .hedy files in the format that batchhedy reads."""
+    os.makedirs(directory, exist_ok=True)
+    today = datetime.date.today().isoformat()
+    for number, result in enumerate(results, 1):
+        filename = path.join(directory, f'fuzz-level{result.level:02}-{number:03}.hedy')
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(f'# level = {result.level}\n')
+            f.write(f'{today}\n')
+            f.write(f'# fuzzhedy seed {seed}: {result.seconds:.4f}s\n')
+            f.write(f'# error: {result.error}\n')
+            f.write(result.code + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time transpiling random programs made from the grammar of every level.')
+    parser.add_argument('--levels', type=int, nargs='+', default=range(1, hedy.HEDY_MAX_LEVEL + 1))
+    parser.add_argument('--programs', type=int, default=100, help='programs per level')
+    parser.add_argument('--lines', type=int, default=10, help='the number of lines a program grows to')
+    parser.add_argument('--depth', type=int, default=3, help='the most nested blocks in a program')
+    parser.add_argument('--near-valid', type=float, default=0.3, help='the part of the programs with a mistake in them')
+    parser.add_argument('--top', type=int, default=10, help='the slowest programs per level that go in the corpus')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=10, help='give up on a program after this many seconds')
+    parser.add_argument('--out', default=path.join(path.dirname(path.abspath(__file__)), 'batchhedy', 'fuzz'))
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    for level in args.levels:
+        results = fuzz_level(level, args.programs, lines=args.lines, depth=args.depth,
+                             near_valid=args.near_valid, seed=seed + level, timeout=args.timeout)
+        errors = sum(1 for r in results if r.error is not None)
+        total = sum(r.seconds for r in results)
+        print(f'level {level:2}  {len(results)} programs  {total:7.2f}s  slowest {results[0].seconds:.3f}s  '
+              f'errors {errors}')
+        write_corpus(results[:args.top], args.out, seed + level)
+    print(f'Wrote the slowest programs to {args.out} (seed {seed})')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,10 @@
 # This file is used to configure gunicorn,
 # used on Heroku.
+import os
+
+# With GUNICORN_PRELOAD set the app is loaded and warmed up in the master, before the
+# workers are forked, so they share its memory instead of each loading their own copy.
+preload_app = bool(os.getenv('GUNICORN_PRELOAD'))
 
 def worker_exit(server, worker):
     # When the worker is being exited (perhaps because of a timeout),
@@ -8,7 +13,13 @@ def worker_exit(server, worker):
     querylog.emergency_shutdown()
     jsonbin.emergency_shutdown()
 
+def when_ready(server):
+    """When the master is ready to fork the workers."""
+    if preload_app:
+        import app
+        app.on_preload()
+
 def post_fork(server, worker):
     """When the worker has started."""
     import app
-    app.on_server_start()
\ No newline at end of file
+    app.on_server_start()
@@ -1,15 +1,44 @@
 from lark import Lark
-from lark.exceptions import LarkError, UnexpectedEOF, UnexpectedCharacters
-from lark import Tree, Transformer, visitors
+from lark.exceptions import LarkError, UnexpectedEOF, UnexpectedCharacters, UnexpectedToken, GrammarError
+from lark import Tree, Token, Transformer, visitors
 from os import path
+import io
+import os
 import utils
 from collections import namedtuple
+import collections
+import concurrent.futures
+import contextlib
+import copyreg
+import functools
 import hashlib
+import importlib
+import logging
+import lark
+import pickle
 import re
+import threading
+import time
+import types
+import turtletrace
+
+logger = logging.getLogger('hedy')
+
+# Called with the name of a counter, like 'transpile_cache_hit', whenever there is something
+# to count. The server sets this to querylog.log_counter, elsewhere we don't count.
+COUNTER_CALLBACK = None
+
+def log_counter(name):
+    if COUNTER_CALLBACK is not None:
+        COUNTER_CALLBACK(name)
 
 # Some useful constants
 HEDY_MAX_LEVEL = 22
-MAX_LINES = 100
+# the longest program we transpile. It has to fit in TRANSPILE_TIMEOUT (10 seconds on the
+# server) at every level, also with an error, which is parsed again at another level. Levels 11
+# to 16 are the slowest, programs of 200 lines with an error take them up to 8 seconds, at 300
+# lines that is close to 10 (measure with tests/tests_scaling.py). Raise TRANSPILE_TIMEOUT with it.
+MAX_LINES = 200
 
 #dictionary to store transpilers
 TRANSPILER_LOOKUP = {}
@@ -47,9 +76,11 @@ commands_per_level = {1: ['print', 'ask', 'echo', 'turn', 'forward'] ,
 characters_that_need_escaping = ["\\", "'"]
 
 
+RESERVED_WORDS = frozenset(reserved_words)
+NON_LATIN_START = re.compile('[^a-zA-Z0-9_]')
+
 def hash_needed(name):
-    pattern = re.compile('[^a-zA-Z0-9_]')
-    return name in reserved_words or pattern.match(name) != None
+    return name in RESERVED_WORDS or NON_LATIN_START.match(name) != None
 
 def hash_var(name):
     if hash_needed(name):
@@ -57,57 +88,131 @@ def hash_var(name):
         # being reservered keywords
         # or non-latin vars to comply with Skulpt, which does not implement PEP3131 :(
         # prepend with v for when hash starts with a number
-
-        hash_object = hashlib.md5(name.encode())
-        return "v" + hash_object.hexdigest()
+        return hashed_name(str(name))
     else:
         return name
 
+# variables are hashed every time they are used, so we remember the hashes
+@functools.lru_cache(maxsize=4096)
+def hashed_name(name):
+    hash_object = hashlib.md5(name.encode())
+    return "v" + hash_object.hexdigest()
+
 def closest_command(invalid_command, known_commands):
     # First search for 100% match of known commands
     #
     #  closest_command() searches for known commands in an invalid command.
     #
     #  It will return the known command which is closest positioned at the beginning.
-    #  It will return '' if the invalid command does not contain any known command.
+    #  If the invalid command does not contain any known command, it returns the
+    #  known command with the smallest string distance to it.
     #
-    min_position = len(invalid_command)
-    min_command = ''
-    for known_command in known_commands:
-        position = invalid_command.find(known_command)
-        if position != -1 and position < min_position:
-            min_position = position
-            min_command = known_command
-
-    # If not found, search for partial match of know commands
-    if min_command == '':
-        min_command = closest_command_with_min_distance(invalid_command, known_commands)
-
-    # Check if we are not returning the found command
-    # In that case we have no suggestion
-    # This is to prevent "print is not a command in Hedy level 3, did you mean print?" error message
-
-    if min_command == invalid_command:
-        return None
+    return suggestion_index(tuple(known_commands)).suggest(invalid_command)
+
 
-    return min_command
+# the same few typos are made over and over, so we remember the suggestions for them
+@functools.lru_cache(maxsize=4096)
+def suggested_command(invalid_command, level):
+    """The command of the level to suggest for an invalid command, see closest_command."""
+    return SUGGESTION_INDEXES[level].suggest(invalid_command)
 
 
-def closest_command_with_min_distance(command, commands):
-    #simple string distance, could be more sophisticated MACHINE LEARNING!
-    min = 1000
-    min_command = ''
-    for c in commands:
-        min_c = minimum_distance(c, command)
-        if min_c < min:
-            min = min_c
-            min_command = c
-    return min_command
+# the string distance up to which an invalid command counts as a typo of a command
+TYPO_DISTANCE = 2
+
+
+class SuggestionIndex:
+    """Finds the known commands that an invalid command looks like.
+
+    Most invalid commands are typos of a command, a string distance of one or
+    two. Two strings are that close only if deleting at most that many
+    characters from both gives the same string, so we keep the commands under
+    every string that such deletions make of them. For an invalid command we
+    then only compare with the commands under its own deletions, however many
+    commands there are. When two commands are as close, the one that comes
+    first in the list wins.
+    """
+    def __init__(self, commands):
+        self.commands = list(dict.fromkeys(commands))
+        self.order = {command: order for order, command in enumerate(self.commands)}
+        self.deletions = collections.defaultdict(set)
+        for command in self.commands:
+            for deleted in deletions(command, TYPO_DISTANCE):
+                self.deletions[deleted].add(command)
+        self.longest = max((len(command) for command in self.commands), default=0)
+        # finds the command that is in the invalid command the earliest, at the same
+        # position the first alternative of the pattern wins, like the first command
+        self.pattern = re.compile('|'.join(re.escape(c) for c in self.commands)) if self.commands else None
+
+    def suggest(self, invalid_command):
+        """The command to suggest, or None if the invalid command is a known command."""
+        match = self.pattern.search(invalid_command) if self.pattern else None
+        if match:
+            command = match.group(0)
+        else:
+            # If not found, search for partial match of know commands
+            command = self.closest(invalid_command)
+
+        # Check if we are not returning the found command
+        # In that case we have no suggestion
+        # This is to prevent "print is not a command in Hedy level 3, did you mean print?" error message
+        if command == invalid_command:
+            return None
+        return command
+
+    def closest(self, word):
+        """The command with the smallest string distance to word, '' if there are no commands."""
+        close = self.candidates(word, k=1)
+        if close:
+            return close[0][0]
+        # not a typo, so we compare with all commands, but stop comparing once a command is further
+        # away than the closest so far
+        best_distance, best_command = None, ''
+        for command in self.commands:
+            distance = minimum_distance(command, word, best_distance)
+            if best_distance is None or distance < best_distance:
+                best_distance, best_command = distance, command
+        return best_command
+
+    def candidates(self, word, k=3, max_distance=TYPO_DISTANCE):
+        """The k commands closest to word, at most max_distance away, as (command, distance) tuples."""
+        if max_distance > TYPO_DISTANCE:
+            possible = self.commands
+        elif len(word) - self.longest > max_distance:
+            possible = []
+        else:
+            possible = set()
+            for deleted in deletions(word, max_distance):
+                possible.update(self.deletions.get(deleted, ()))
+        scored = sorted((minimum_distance(command, word, max_distance), self.order[command], command)
+                        for command in possible)
+        return [(command, distance) for distance, order, command in scored if distance <= max_distance][:k]
 
-def minimum_distance(s1, s2):
-    """Return string distance between 2 strings."""
+
+def deletions(word, count):
+    """The strings made by deleting at most count characters from word, word included."""
+    found = {word}
+    last = {word}
+    for _ in range(count):
+        last = {w[:i] + w[i + 1:] for w in last for i in range(len(w))}
+        found |= last
+    return found
+
+
+@functools.lru_cache(maxsize=64)
+def suggestion_index(commands):
+    return SuggestionIndex(commands)
+
+
+def minimum_distance(s1, s2, limit=None):
+    """Return string distance between 2 strings.
+
+    With a limit, returns limit + 1 as soon as it is clear the distance is larger than limit.
+    """
     if len(s1) > len(s2):
         s1, s2 = s2, s1
+    if limit is not None and len(s2) - len(s1) > limit:
+        return limit + 1
     distances = range(len(s1) + 1)
     for index2, char2 in enumerate(s2):
         new_distances = [index2 + 1]
@@ -117,13 +222,29 @@ def minimum_distance(s1, s2):
             else:
                 new_distances.append(1 + min((distances[index1], distances[index1 + 1], new_distances[-1])))
         distances = new_distances
+        if limit is not None and min(distances) > limit:
+            return limit + 1
     return distances[-1]
 
+# the suggestion index of every level, built once
+SUGGESTION_INDEXES = {level: SuggestionIndex(commands) for level, commands in commands_per_level.items()}
+
 class HedyException(Exception):
     def __init__(self, message, **arguments):
         self.error_code = message
         self.arguments = arguments
 
+    def __reduce__(self):
+        # subclasses all have different constructor arguments, so exceptions are
+        # unpickled from their attributes (f.e. when they are sent between processes)
+        return restore_exception, (self.__class__, self.args, self.__dict__)
+
+def restore_exception(cls, args, attributes):
+    ex = cls.__new__(cls)
+    ex.args = args
+    ex.__dict__.update(attributes)
+    return ex
+
 class InvalidSpaceException(HedyException):
     def __init__(self, level, line_number, fixed_code):
         super().__init__('Invalid Space')
@@ -151,6 +272,10 @@ class InputTooBigException(HedyException):
     def __init__(self, **arguments):
         super().__init__('Too Big', **arguments)
 
+class TranspileTimeoutException(HedyException):
+    def __init__(self, **arguments):
+        super().__init__('Too Slow', **arguments)
+
 class InvalidCommandException(HedyException):
     def __init__(self, **arguments):
         super().__init__('Invalid', **arguments)
@@ -179,32 +304,125 @@ class IndentationException(HedyException):
     def __init__(self, **arguments):
         super().__init__('Unexpected Indentation', **arguments)
 
-class ExtractAST(Transformer):
+class HedyTree:
+    """A node of a parse tree or AST, like lark's Tree but with __slots__.
+
+    Lark's Tree keeps its attributes in a __dict__, which more than doubles the
+    memory of a node (on Python 3.9 a Tree takes 152 bytes, a HedyTree 56, both
+    without their children list). The parsers build HedyTrees (see the
+    tree_class in create_parser) and the transformers return them, so all trees
+    in hedy.py are HedyTrees. Lark's own Transformers do not recurse into them,
+    use HedyTransformer.
+    """
+    __slots__ = ('data', 'children', '_meta')
+
+    def __init__(self, data, children, meta=None):
+        self.data = data
+        self.children = children
+        self._meta = meta
+
+    meta = Tree.meta
+    __repr__ = Tree.__repr__
+    __eq__ = Tree.__eq__
+    __ne__ = Tree.__ne__
+    __hash__ = Tree.__hash__
+
+    def _pretty(self, level, indent_str):
+        # Tree._pretty, but descending into HedyTrees instead of lark Trees
+        if len(self.children) == 1 and not isinstance(self.children[0], HedyTree):
+            return [indent_str * level, self.data, '\t', '%s' % (self.children[0],), '\n']
+
+        lines = [indent_str * level, self.data, '\n']
+        for child in self.children:
+            if isinstance(child, HedyTree):
+                lines += child._pretty(level + 1, indent_str)
+            else:
+                lines += [indent_str * (level + 1), '%s' % (child,), '\n']
+        return lines
+
+    pretty = Tree.pretty
+
+class HedyTransformer(Transformer):
+    """A Lark Transformer that finds the method for a rule in a table instead of with getattr.
+
+    Lark looks up the method of every node with getattr, and a rule or token
+    without a method of its own (most of them, for the Filter classes) costs a
+    caught AttributeError on top of that. Our transformers do not change their
+    methods after the class is made, so every class gets its table of rule and
+    token names to functions once, when it is defined. Methods decorated with
+    lark's v_args are not supported.
+    """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._rule_methods = {name: getattr(cls, name) for name in dir(cls)
+                            if not name.startswith('_') and callable(getattr(cls, name))}
+
+    def _call_userfunc(self, tree, new_children=None):
+        children = new_children if new_children is not None else tree.children
+        f = self._rule_methods.get(tree.data)
+        if f is None:
+            return self.__default__(tree.data, children, tree.meta)
+        try:
+            return f(self, children)
+        except (GrammarError, visitors.Discard):
+            raise
+        except Exception as e:
+            raise visitors.VisitError(tree.data, tree, e)
+
+    def _call_userfunc_token(self, token):
+        f = self._rule_methods.get(token.type)
+        if f is None:
+            return self.__default_token__(token)
+        try:
+            return f(self, token)
+        except (GrammarError, visitors.Discard):
+            raise
+        except Exception as e:
+            raise visitors.VisitError(token.type, token, e)
+
+    def __default__(self, data, children, meta):
+        return HedyTree(data, children, meta)
+
+    def _transform_tree(self, tree):
+        children = []
+        for c in tree.children:
+            try:
+                if isinstance(c, HedyTree):
+                    children.append(self._transform_tree(c))
+                elif self.__visit_tokens__ and isinstance(c, Token):
+                    children.append(self._call_userfunc_token(c))
+                else:
+                    children.append(c)
+            except visitors.Discard:
+                pass
+        return self._call_userfunc(tree, children)
+
+class ExtractAST(HedyTransformer):
     # simplifies the tree: f.e. flattens arguments of text, var and punctuation for further processing
     def text(self, args):
-        return Tree('text', [''.join([str(c) for c in args])])
+        return HedyTree('text', [''.join([str(c) for c in args])])
 
     #level 2
     def var(self, args):
-        return Tree('var', [''.join([str(c) for c in args])])
+        return HedyTree('var', [''.join([str(c) for c in args])])
     def punctuation(self, args):
-        return Tree('punctuation', [''.join([str(c) for c in args])])
+        return HedyTree('punctuation', [''.join([str(c) for c in args])])
     def index(self, args):
         return ''.join([str(c) for c in args])
     def list_access(self, args):
-        if type(args[1]) == Tree:
+        if type(args[1]) == HedyTree:
             if "random" in args[1].data:
-                return Tree('list_access', [args[0], 'random'])
+                return HedyTree('list_access', [args[0], 'random'])
             else:
-                return Tree('list_access', [args[0], args[1].children[0]])
+                return HedyTree('list_access', [args[0], args[1].children[0]])
         else:
-            return Tree('list_access', [args[0], args[1]])
+            return HedyTree('list_access', [args[0], args[1]])
 
     #level 5
     def number(self, args):
-        return Tree('number', ''.join([str(c) for c in args]))
+        return HedyTree('number', ''.join([str(c) for c in args]))
 
-class AllAssignmentCommands(Transformer):
+class AllAssignmentCommands(HedyTransformer):
     # returns a list of variable and list access
     # so these can be excluded when printing
 
@@ -283,7 +501,7 @@ class AllAssignmentCommands(Transformer):
     def __default__(self, args, children, meta):
         return self.filter_ask_assign(children)
 
-class AllAssignmentCommandsHashed(Transformer):
+class AllAssignmentCommandsHashed(HedyTransformer):
     # returns a list of variable and list access
     # so these can be excluded when printing
 
@@ -370,7 +588,7 @@ def are_all_arguments_true(args):
 # this class contains code shared between IsValid and IsComplete, which are quite similar
 # because both filter out some types of 'wrong' nodes
 # TODO: this could also use a default lark rule like AllAssignmentCommands does now
-class Filter(Transformer):
+class Filter(HedyTransformer):
     def __default__(self, args, children, meta):
         return are_all_arguments_true(children)
 
@@ -399,7 +617,7 @@ class Filter(Transformer):
     def text(self, args):
         return all(args), ''.join([c for c in args])
 
-class UsesTurtle(Transformer):
+class UsesTurtle(HedyTransformer):
     # returns true if Forward or Turn are in the tree, false otherwise
     def __default__(self, args, children, meta):
         if len(children) == 0:  # no children? you are a leaf that is not Turn or Forward, so you are no Turtle command
@@ -489,6 +707,200 @@ class IsComplete(Filter):
 
     #other rules are inherited from Filter
 
+class SymbolTable:
+    """The variables of a program, as the transpilers look them up.
+
+    Holds the names that are assigned anywhere in the program (by assign, ask,
+    for etc.), both as written and hashed (see hash_var), plus list accesses
+    like random.choice(dieren). Transpilers check every argument against it,
+    so it is a set instead of the lists the AllAssignmentCommands transformers return.
+    """
+    def __init__(self, names=(), numbers=()):
+        self.names = set(names)
+        # the variables that always hold an int, see numeric_variables
+        self.numbers = set(numbers)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        self.names.add(name)
+
+# number literals, as written in Hedy and in Python (after int_literal, which removes leading zeros)
+NUMBER_LITERAL = re.compile(r'[+-]?[0-9]+')
+
+CALCULATIONS = {'addition', 'substraction', 'multiplication', 'division'}
+COMPARISONS = {'smaller', 'bigger', 'smaller_equal', 'bigger_equal'}
+# rules that hold a single name or literal
+WRAPPERS = {'var', 'text', 'var_access', 'number'}
+# rules for which the transpilers write the variables in them the same way, whether they hold an int or a string
+SAFE_USES = {'program', 'command', 'print', 'print_nq', 'forward', 'turn', 'equality_check', 'not_equal',
+             'condition', 'andcondition', 'orcondition', 'ifs', 'ifelse', 'elses', 'elifs', 'while_loop'}
+
+def is_number_literal(s):
+    return isinstance(s, str) and NUMBER_LITERAL.fullmatch(s) is not None
+
+def is_int_literal(s):
+    # a number literal written like Python writes its int, so not 05 or +5: a variable
+    # holds the same value as an int as it would as a string, printed or compared as text
+    return is_number_literal(s) and int_literal(s) == s
+
+def int_literal(s):
+    return str(int(s))
+
+def as_int(argument, code, lookup):
+    # code is how an argument of a calculation or comparison is written in Python, this returns
+    # it as an int: number literals and variables that always hold an int don't need int()
+    if is_number_literal(argument):
+        return int_literal(argument)
+    if argument in lookup.numbers:
+        return code
+    return f'int({code})'
+
+def numeric_variables(ast, level):
+    """The variables of which the transpilers can leave out int() in calculations, comparisons and loops.
+
+    A variable qualifies when all its assignments (including for loops) give it
+    an int, with number literals written like Python writes them (not 05 or +5),
+    it is used in a calculation, comparison or loop, and it is never used where
+    an int behaves differently than the string of its digits, like in a list,
+    an 'in' check or an ask at the levels where ask doesn't use str().
+    Then the transpilers also assign number literals to it as ints instead of strings.
+    """
+    numeric_assignments = set()
+    other_assignments = set()
+    numeric_uses = set()
+    unsafe_uses = set()
+
+    def leaf(node):
+        # the name or literal in a leaf, None if the node is not a leaf
+        if isinstance(node, str):
+            return node
+        if isinstance(node, HedyTree) and node.data in WRAPPERS:
+            children = node.children
+            if isinstance(children, str):
+                return children
+            if len(children) == 1 and isinstance(children[0], str):
+                return children[0]
+        return None
+
+    def use(node, uses):
+        name = leaf(node)
+        if name is None:
+            visit(node)
+        else:
+            uses.add(name)
+
+    def visit(node):
+        if not isinstance(node, HedyTree) or isinstance(node.children, str):
+            return
+        rule, children = node.data, node.children
+        if rule in ('assign', 'ask', 'input', 'list_access_var', 'assign_list', 'for_loop'):
+            target = leaf(children[0])
+            value = children[1] if len(children) == 2 else None
+            numeric = rule == 'for_loop' or rule == 'assign' and (
+                is_int_literal(leaf(value)) or isinstance(value, HedyTree) and value.data in CALCULATIONS | {'length'})
+            (numeric_assignments if numeric else other_assignments).add(target)
+            for i, child in enumerate(children[1:], start=1):
+                if rule == 'for_loop' and i in (1, 2):
+                    use(child, numeric_uses)
+                elif rule == 'list_access_var' and i == 2 or rule == 'input' and level >= 11:
+                    use(child, set())
+                elif rule == 'assign' or rule == 'assign_list':
+                    # names in the value of an assignment are written as texts, only calculations use variables
+                    if leaf(child) is None:
+                        visit(child)
+                else:
+                    use(child, unsafe_uses)
+        elif rule == 'repeat':
+            use(children[0], numeric_uses)
+            for child in children[1:]:
+                use(child, unsafe_uses)
+        elif rule in CALCULATIONS or rule in COMPARISONS:
+            for child in children:
+                use(child, numeric_uses)
+        elif rule == 'equality_check' and level >= 20 and any(isinstance(c, HedyTree) and c.data in CALCULATIONS for c in children):
+            for child in children:
+                use(child, numeric_uses)
+        elif rule == 'list_access':
+            use(children[0], unsafe_uses)
+            for child in children[1:]:
+                use(child, set())
+        elif rule in SAFE_USES:
+            for child in children:
+                use(child, set())
+        else:
+            for child in children:
+                use(child, unsafe_uses)
+
+    visit(ast)
+    names = (numeric_assignments & numeric_uses) - other_assignments - unsafe_uses
+    return names | {hash_var(name) for name in names}
+
+# result of analysing a parse tree, see TreeAnalysis
+Analysis = namedtuple('Analysis', ['ast', 'lookup', 'hashed_lookup', 'is_valid', 'is_complete', 'has_turtle'])
+
+class TreeAnalysis:
+    # Computes everything transpile_inner needs to know about a parse tree in one walk:
+    # the abstract syntax tree (ExtractAST), the variables (AllAssignmentCommands and
+    # AllAssignmentCommandsHashed), errors (IsValid and IsComplete) and turtle use (UsesTurtle).
+    # The rules of those transformers are reused as is, we only run them side by side:
+    # every node is visited once and each transformer gets its own results for the children.
+
+    # rules for which ExtractAST builds a new node, the variable transformers run on that node
+    EXTRACTED_RULES = {name for name in vars(ExtractAST) if not name.startswith('_')}
+
+    def __init__(self, level):
+        self.extract = ExtractAST()
+        # these transform the parse tree
+        self.tree_analysers = [IsValid(), IsComplete(level), UsesTurtle()]
+        # these transform the AST
+        self.ast_analysers = [AllAssignmentCommands(), AllAssignmentCommandsHashed()]
+
+    def analyse(self, program_root):
+        return self.as_analysis(self.visit(program_root))
+
+    def analyse_visited(self, program_root, visited_children):
+        # like analyse, for a program of which the children have been visited before
+        return self.as_analysis(self.combine(program_root, visited_children))
+
+    def as_analysis(self, visited):
+        ast, tree_results, ast_results = visited
+        is_valid, is_complete, has_turtle = tree_results
+        lookup, hashed_lookup = ast_results
+        return Analysis(ast, lookup, hashed_lookup, is_valid, is_complete, has_turtle)
+
+    def visit(self, node):
+        # returns (ast, [result of each tree analyser], [result of each ast analyser])
+        if not isinstance(node, HedyTree):
+            if isinstance(node, Token):
+                return (self.extract._call_userfunc_token(node),
+                        [a._call_userfunc_token(node) for a in self.tree_analysers],
+                        [a._call_userfunc_token(node) for a in self.ast_analysers])
+            return node, [node] * len(self.tree_analysers), [node] * len(self.ast_analysers)
+
+        return self.combine(node, [self.visit(c) for c in node.children])
+
+    def combine(self, node, children):
+        # runs all transformers on a node, given the visit results of its children
+        ast = self.extract._call_userfunc(node, [c[0] for c in children])
+        tree_results = [a._call_userfunc(node, [c[1][i] for c in children])
+                        for i, a in enumerate(self.tree_analysers)]
+
+        if node.data in self.EXTRACTED_RULES:
+            # ExtractAST made a new node (or a string), so run the transformers over that
+            ast_results = [a.transform(ast) if isinstance(ast, HedyTree) else ast for a in self.ast_analysers]
+        else:
+            ast_results = [a._call_userfunc(ast, [c[2][i] for c in children])
+                           for i, a in enumerate(self.ast_analysers)]
+        return ast, tree_results, ast_results
+
 def process_characters_needing_escape(value):
     # defines what happens if a kids uses ' or \ in in a string
     for c in characters_that_need_escaping:
@@ -503,7 +915,7 @@ def hedy_transpiler(level):
   return decorator
 
 @hedy_transpiler(level=1)
-class ConvertToPython_1(Transformer):
+class ConvertToPython_1(HedyTransformer):
 
     def __init__(self, punctuation_symbols, lookup):
         self.punctuation_symbols = punctuation_symbols
@@ -740,7 +1152,7 @@ class ConvertToPython_5(ConvertToPython_4):
         #force all to be printed as strings (since there can not be int arguments)
         args_new = []
         for a in args:
-            if type(a) is Tree:
+            if type(a) is HedyTree:
                 args_new.append(f'str({a.children})')
             elif "'" not in a:
                 args_new.append(f'str({a})')
@@ -763,8 +1175,10 @@ class ConvertToPython_5(ConvertToPython_4):
         if len(args) == 2:
             parameter = args[0]
             value = args[1]
-            if type(value) is Tree:
+            if type(value) is HedyTree:
                 return parameter + " = " + value.children
+            elif parameter in self.lookup.numbers and is_int_literal(value):
+                return parameter + " = " + value
             else:
                 return parameter + " = '" + value + "'"
         else:
@@ -773,19 +1187,19 @@ class ConvertToPython_5(ConvertToPython_4):
             return parameter + " = [" + ", ".join(values) + "]"
 
     def process_token_or_tree(self, argument):
-        if type(argument) is Tree:
+        if type(argument) is HedyTree:
             return f'{str(argument.children)}'
         else:
-            return f'int({argument})'
+            return as_int(argument, argument, self.lookup)
 
     def process_calculation(self, args, operator):
         # arguments of a sum are either a token or a
         # tree resulting from earlier processing
         # for trees we need to grap the inner string
-        # for tokens we add int around them
+        # for tokens we add int around them, unless they are ints already
 
         args = [self.process_token_or_tree(a) for a in args]
-        return Tree('sum', f'{args[0]} {operator} {args[1]}')
+        return HedyTree('sum', f'{args[0]} {operator} {args[1]}')
 
     def addition(self, args):
         return self.process_calculation(args, '+')
@@ -806,9 +1220,9 @@ class ConvertToPython_6(ConvertToPython_5):
 
     def repeat(self, args):
         var_name = self.get_fresh_var('i')
-        times = process_variable(args[0], self.lookup)
+        times = as_int(args[0], process_variable(args[0], self.lookup), self.lookup)
         command = args[1]
-        return f"""for {var_name} in range(int({str(times)})):
+        return f"""for {var_name} in range({times}):
 {indent(command)}"""
 
 @hedy_transpiler(level=7)
@@ -822,7 +1236,7 @@ class ConvertToPython_7(ConvertToPython_6):
 
     def repeat(self, args):
         all_lines = [indent(x) for x in args[1:]]
-        return "for i in range(int(" + str(args[0]) + ")):\n" + "\n".join(all_lines)
+        return "for i in range(" + as_int(args[0], str(args[0]), self.lookup) + "):\n" + "\n".join(all_lines)
 
     def ifs(self, args):
         args = [a for a in args if a != ""] # filter out in|dedent tokens
@@ -842,11 +1256,13 @@ class ConvertToPython_7(ConvertToPython_6):
         if len(args) == 2:
             parameter = args[0]
             value = args[1]
-            if type(value) is Tree:
+            if type(value) is HedyTree:
                 return parameter + " = " + value.children
             else:
                 if "'" in value or 'random.choice' in value:  # TODO: should be a call to wrap nonvarargument is quotes!
                     return parameter + " = " + value
+                elif parameter in self.lookup.numbers and is_int_literal(value):
+                    return parameter + " = " + value
                 else:
                     return parameter + " = '" + value + "'"
         else:
@@ -859,7 +1275,7 @@ class ConvertToPython_7(ConvertToPython_6):
             return process_variable(args[0], self.lookup)
         else:
         # this is list_access
-            return args[0] + "[" + str(args[1]) + "]" if type(args[1]) is not Tree else "random.choice(" + str(args[0]) + ")"
+            return args[0] + "[" + str(args[1]) + "]" if type(args[1]) is not HedyTree else "random.choice(" + str(args[0]) + ")"
 
 @hedy_transpiler(level=8)
 class ConvertToPython_8(ConvertToPython_7):
@@ -867,8 +1283,10 @@ class ConvertToPython_8(ConvertToPython_7):
         args = [a for a in args if a != ""]  # filter out in|dedent tokens
         body = "\n".join([indent(x) for x in args[3:]])
         stepvar_name = self.get_fresh_var('step')
-        return f"""{stepvar_name} = 1 if int({args[1]}) < int({args[2]}) else -1
-for {args[0]} in range(int({args[1]}), int({args[2]}) + {stepvar_name}, {stepvar_name}):
+        begin = as_int(args[1], args[1], self.lookup)
+        end = as_int(args[2], args[2], self.lookup)
+        return f"""{stepvar_name} = 1 if {begin} < {end} else -1
+for {args[0]} in range({begin}, {end} + {stepvar_name}, {stepvar_name}):
 {body}"""
 @hedy_transpiler(level=9)
 @hedy_transpiler(level=10)
@@ -884,7 +1302,7 @@ class ConvertToPython_11(ConvertToPython_9_10):
         args_new = []
         var = args[0]
         for a in args[1:]:
-            if type(a) is Tree:
+            if type(a) is HedyTree:
                 args_new.append(f'str({a.children})')
             elif "'" not in a:
                 args_new.append(f'str({a})')
@@ -924,11 +1342,13 @@ class ConvertToPython_13(ConvertToPython_12):
         if len(args) == 2:
             parameter = args[0]
             value = args[1]
-            if type(value) is Tree:
+            if type(value) is HedyTree:
                 return parameter + " = " + value.children
             else:
                 if "'" in value or 'random.choice' in value:  # TODO: should be a call to wrap nonvarargument is quotes!
                     return parameter + " = " + value
+                elif parameter in self.lookup.numbers and is_int_literal(value):
+                    return parameter + " = " + value
                 else:
                     # FH, June 21 the addition of _true/false is a bit of a hack. cause they are first seen as vars that at reserved words, they are then hashed and we undo that here
                     # could/should be fixed in the grammar!
@@ -969,20 +1389,18 @@ class ConvertToPython_15(ConvertToPython_14):
 @hedy_transpiler(level=16)
 class ConvertToPython_16(ConvertToPython_15):
     def smaller(self, args):
-        arg0 = process_variable(args[0], self.lookup)
-        arg1 = process_variable(args[1], self.lookup)
-        if len(args) == 2:
-            return f"int({arg0}) < int({arg1})"  # no and statements
-        else:
-            return f"int({arg0}) < int({arg1}) and {args[2]}"
+        return self.comparison(args, '<')
 
     def bigger(self, args):
-        arg0 = process_variable(args[0], self.lookup)
-        arg1 = process_variable(args[1], self.lookup)
+        return self.comparison(args, '>')
+
+    def comparison(self, args, operator):
+        arg0 = as_int(args[0], process_variable(args[0], self.lookup), self.lookup)
+        arg1 = as_int(args[1], process_variable(args[1], self.lookup), self.lookup)
         if len(args) == 2:
-            return f"int({arg0}) > int({arg1})"  # no and statements
+            return f"{arg0} {operator} {arg1}"  # no and statements
         else:
-            return f"int({arg0}) > int({arg1}) and {args[2]}"
+            return f"{arg0} {operator} {arg1} and {args[2]}"
 
 @hedy_transpiler(level=17)
 class ConvertToPython_17(ConvertToPython_16):
@@ -1002,13 +1420,15 @@ class ConvertToPython_18_19(ConvertToPython_17):
         if len(args) == 2:
             parameter = args[0]
             value = args[1]
-            if type(value) is Tree:
+            if type(value) is HedyTree:
                 return parameter + " = " + value.children
             else:
                 if "'" in value or 'random.choice' in value:  # TODO: should be a call to wrap nonvarargument is quotes!
                     return parameter + " = " + value
                 elif "len(" in value:
                     return parameter + " = " + value
+                elif parameter in self.lookup.numbers and is_int_literal(value):
+                    return parameter + " = " + value
                 else:
                     if value == 'true' or value == 'True':
                         return parameter + " = True"
@@ -1024,10 +1444,10 @@ class ConvertToPython_18_19(ConvertToPython_17):
 @hedy_transpiler(level=20)
 class ConvertToPython_20(ConvertToPython_18_19):
     def equality_check(self, args):
-        if type(args[0]) is Tree:
-            return args[0].children + " == int(" + args[1] + ")"
-        if type(args[1]) is Tree:
-            return "int(" + args[0] + ") == " + args[1].children
+        if type(args[0]) is HedyTree:
+            return args[0].children + " == " + as_int(args[1], args[1], self.lookup)
+        if type(args[1]) is HedyTree:
+            return as_int(args[0], args[0], self.lookup) + " == " + args[1].children
         arg0 = process_variable(args[0], self.lookup)
         arg1 = process_variable(args[1], self.lookup)
         if arg1 == '\'True\'' or arg1 == '\'true\'':
@@ -1050,80 +1470,101 @@ class ConvertToPython_21(ConvertToPython_20):
 @hedy_transpiler(level=22)
 class ConvertToPython_22(ConvertToPython_21):
     def smaller_equal(self, args):
-        arg0 = process_variable(args[0], self.lookup)
-        arg1 = process_variable(args[1], self.lookup)
-        if len(args) == 2:
-            return f"int({arg0}) <= int({arg1})"  # no and statements
-        else:
-            return f"int({arg0}) <= int({arg1}) and {args[2]}"
+        return self.comparison(args, '<=')
 
     def bigger_equal(self, args):
-        arg0 = process_variable(args[0], self.lookup)
-        arg1 = process_variable(args[1], self.lookup)
-        if len(args) == 2:
-            return f"int({arg0}) >= int({arg1})"  # no and statements
-        else:
-            return f"int({arg0}) >= int({arg1}) and {args[2]}"
+        return self.comparison(args, '>=')
+
+
+def parse_grammar_rules(grammar_text):
+    # returns the rules of a grammar as a dictionary from rule name to the line defining it
+    # the name is everything before the first : (there can be : in the rule itself)
+    rules = {}
+    for line in grammar_text.split('\n'):
+        if line == '' or line[0] == '/': #skip comments and empty lines:
+            continue
+        rules[line.split(':')[0]] = line
+    return rules
+
+
+def format_grammar_rules(rules):
+    return '\n'.join(sorted(rules.values()))
 
 
 def merge_grammars(grammar_text_1, grammar_text_2):
     # this function takes two grammar files and merges them into one
     # rules that are redefined in the second file are overridden
-    # rule that are new in the second file are added (remaining_rules_grammar_2)
+    # rule that are new in the second file are added
+    merged_rules = parse_grammar_rules(grammar_text_1)
+    merged_rules.update(parse_grammar_rules(grammar_text_2))
+    return format_grammar_rules(merged_rules)
 
-    merged_grammar = []
 
-    rules_grammar_1 = grammar_text_1.split('\n')
-    remaining_rules_grammar_2 = grammar_text_2.split('\n')
-    for line_1 in rules_grammar_1:
-        if line_1 == '' or line_1[0] == '/': #skip comments and empty lines:
-            continue
-        parts = line_1.split(':')
-        name_1, definition_1 = parts[0], ''.join(parts[1:]) #get part before are after : (this is a join because there can be : in the rule)
-
-        rules_grammar_2 = grammar_text_2.split('\n')
-        override_found = False
-        for line_2 in rules_grammar_2:
-            if line_2 == '' or line_2[0] == '/':  # skip comments and empty lines:
-                continue
-            parts = line_2.split(':')
-            name_2, definition_2 = parts[0], ''.join(parts[1]) #get part before are after :
-            if name_1 == name_2:
-                override_found = True
-                new_rule = line_2
-                # this rule is now in the grammar, remove form this list
-                remaining_rules_grammar_2.remove(new_rule)
-                break
-
-        # new rule found? print that. nothing found? print org rule
-        if override_found:
-            merged_grammar.append(new_rule)
-        else:
-            merged_grammar.append(line_1)
+# filename -> (mtime, text, rules) for every grammar file we read
+GRAMMAR_FILE_CACHE = {}
+
+# level -> (rules of the previous level, rules of the level's file, merged rules, grammar text)
+GRAMMAR_CACHE = {}
+
+
+def read_grammar_file(filename):
+    """Return the text and the rules of a file from the grammars directory.
+
+    Files are only read and parsed again when they change on disk.
+    """
+    script_dir = path.abspath(path.dirname(__file__))
+    loc = path.join(script_dir, "grammars", filename)
+    mtime = os.stat(loc).st_mtime
+    cached = GRAMMAR_FILE_CACHE.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+
+    with open(loc, "r", encoding="utf-8") as file:
+        grammar_text = file.read()
+    rules = parse_grammar_rules(grammar_text)
+    GRAMMAR_FILE_CACHE[filename] = (mtime, grammar_text, rules)
+    return grammar_text, rules
+
+
+def get_grammar_for_level(level):
+    """Return (merged rules, grammar text) for a level.
+
+    Level N is built from the memoized level N-1 plus the additions of level N,
+    and only rebuilt if one of the grammar files it is made of has changed.
+    """
+    if level == 1:
+        # level 1 is used as is, it is the only grammar that is not merged
+        grammar_text, file_rules = read_grammar_file("level1.lark")
+        return file_rules, grammar_text
 
-    #all rules that were not overlapping are new in the grammar, add these too
-    for rule in remaining_rules_grammar_2:
-        if not(rule == '' or rule[0] == '/'):
-            merged_grammar.append(rule)
+    previous_rules, _ = get_grammar_for_level(level - 1)
+    _, file_rules = read_grammar_file("level" + str(level) + "-Additions.lark")
 
-    merged_grammar = sorted(merged_grammar)
-    return '\n'.join(merged_grammar)
+    cached = GRAMMAR_CACHE.get(level)
+    if cached and cached[0] is previous_rules and cached[1] is file_rules:
+        return cached[2], cached[3]
+
+    merged_rules = dict(previous_rules)
+    merged_rules.update(file_rules)
+    grammar = format_grammar_rules(merged_rules)
+    GRAMMAR_CACHE[level] = (previous_rules, file_rules, merged_rules, grammar)
+    return merged_rules, grammar
 
 
 def create_grammar(level):
-    # start with creating the grammar for level 1
-    result = get_full_grammar_for_level(1)
+    _, grammar = get_grammar_for_level(int(level))
+    return grammar
 
-    # then keep merging new grammars in
-    for i in range(2, level+1):
-        grammar_text_i = get_additional_rules_for_level(i)
-        result = merge_grammars(result, grammar_text_i)
 
-    # ready? Save to file to ease debugging
-    # this could also be done on each merge for performance reasons
-    save_total_grammar_file(level, result)
+def save_total_grammar_files():
+    """Write the merged grammar of every level to grammars-Total, to ease debugging.
+
+    This is never done while serving requests: the files are written when starting
+    the server in debug mode and by the deploy build (build-tools/heroku/generate-parsers).
+    """
+    for level in range(1, HEDY_MAX_LEVEL + 1):
+        save_total_grammar_file(level, create_grammar(level))
 
-    return result
 
 def save_total_grammar_file(level, grammar):
     # Load Lark grammars relative to directory of current file
@@ -1134,61 +1575,467 @@ def save_total_grammar_file(level, grammar):
     file.write(grammar)
     file.close()
 
-def get_additional_rules_for_level(level, sub = 0):
-    script_dir = path.abspath(path.dirname(__file__))
-    if sub:
-        filename = "level" + str(level) + "-" + str(sub) + "-Additions.lark"
-    else:
-        filename = "level" + str(level) + "-Additions.lark"
-    with open(path.join(script_dir, "grammars", filename), "r", encoding="utf-8") as file:
-        grammar_text = file.read()
-    return grammar_text
+# str(level) -> (grammar, parser mode, parser)
+PARSER_CACHE = {}
 
-def get_full_grammar_for_level(level):
-    script_dir = path.abspath(path.dirname(__file__))
-    filename = "level" + str(level) + ".lark"
-    with open(path.join(script_dir, "grammars", filename), "r", encoding="utf-8") as file:
-        grammar_text = file.read()
-    return grammar_text
+# str(level) -> lock that is held while the parser of the level is built
+PARSER_LOCKS = collections.defaultdict(threading.Lock)
+PARSER_LOCKS_LOCK = threading.Lock()
+
+# how often a thread had to wait for another thread that was building the same parser
+PARSER_WAITS = 0
+
+# Which parser to build per level:
+#
+# - 'earley': Earley parser with the dynamic lexer. Slow, but it copes with the
+#   ambiguous catch-all rules (text, invalid) our grammars lean on.
+# - 'lalr': LALR(1) parser with a contextual lexer. Linear time, but only works
+#   for grammars without conflicts. If the grammar has conflicts, we fall back
+#   to Earley and remember the rules that caused it in LALR_CONFLICTS.
+# - 'auto': same as 'lalr', but the fallback is expected so we don't warn about it.
+#
+# All levels are on Earley for now: levels 2 and up have conflicts, and level 1
+# builds as LALR but the contextual lexer splits `invalid` differently than Earley
+# does ("abc felienne 123" no longer parses as an invalid command).
+PARSER_MODES = {level: 'earley' for level in range(1, HEDY_MAX_LEVEL + 1)}
+DEFAULT_PARSER_MODE = 'earley'
+
+# level -> sorted list of rule names that made LALR construction fail
+LALR_CONFLICTS = {}
+
+
+def get_parser_mode(level):
+    return PARSER_MODES.get(int(level), DEFAULT_PARSER_MODE)
 
-PARSER_CACHE = {}
+
+def conflicting_rules(grammar_error):
+    """Return the names of the rules mentioned in a Lark collision error.
+
+    Lark reports conflicts as `<rule_name : expansion>` lines, we only keep the
+    rule names and drop the helper rules Lark generates for `*` and `+` (those
+    start with underscores and carry the name of the rule they belong to).
+    """
+    names = set()
+    for name in re.findall(r'<(\w+) :', str(grammar_error)):
+        parts = re.match(r'^__(\w+?)_(?:star|plus)_\d+$', name)
+        names.add(parts.group(1) if parts else name)
+    return sorted(names)
+
+
+def lalr_conflicts(grammar):
+    """Return the names of the rules that keep a grammar from being LALR(1), [] if it is LALR(1)."""
+    try:
+        Lark(grammar, regex=True, parser='lalr', lexer='contextual', tree_class=HedyTree)
+    except GrammarError as e:
+        return conflicting_rules(e)
+    return []
+
+
+def create_parser(grammar, level, mode):
+    """Build a Lark parser for the given grammar in the given parser mode."""
+    if mode in ('lalr', 'auto'):
+        try:
+            parser = Lark(grammar, regex=True, parser='lalr', lexer='contextual', tree_class=HedyTree)
+            LALR_CONFLICTS.pop(level, None)
+            return parser
+        except GrammarError as e:
+            LALR_CONFLICTS[level] = conflicting_rules(e)
+            if mode == 'lalr':
+                logger.warning('Level %s grammar is not LALR(1), falling back to Earley. Conflicting rules: %s',
+                               level, ', '.join(LALR_CONFLICTS[level]))
+    elif mode != 'earley':
+        raise ValueError(f'Unknown parser mode: {mode}')
+
+    return Lark(grammar, regex=True, tree_class=HedyTree)
+
+
+# Prebuilt parsers for all levels, written at deploy time by build-tools/heroku/generate-parsers.
+# Building an Earley parser takes a few hundred milliseconds per level, unpickling
+# a prebuilt one takes about 10ms. Entries are keyed by a hash of the grammar, so
+# a stale artifact is simply ignored and the parser is built from the grammar instead.
+PARSER_ARTIFACT_VERSION = 2
+PARSER_ARTIFACT_FILE = path.join(path.abspath(path.dirname(__file__)), 'grammars-Total', 'parsers.pickle')
+PARSER_ARTIFACT = None
+
+
+class ParserPickler(pickle.Pickler):
+    # Lark keeps a reference to the regex module it was built with, modules
+    # can't be pickled so we store them by name
+    dispatch_table = copyreg.dispatch_table.copy()
+    dispatch_table[types.ModuleType] = lambda module: (importlib.import_module, (module.__name__,))
+
+
+def dump_parser(parser):
+    f = io.BytesIO()
+    ParserPickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(parser)
+    return f.getvalue()
+
+
+def grammar_hash(grammar, mode):
+    key = f'{lark.__version__}\n{mode}\n{grammar}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def save_parser_artifact(filename=PARSER_ARTIFACT_FILE):
+    """Build the parsers for all levels and write them to a single artifact file."""
+    levels = {}
+    for level in range(1, HEDY_MAX_LEVEL + 1):
+        mode = get_parser_mode(level)
+        grammar = create_grammar(level)
+        parser = create_parser(grammar, level, mode)
+        levels[level] = {
+            'hash': grammar_hash(grammar, mode),
+            'grammar': grammar,
+            'conflicts': LALR_CONFLICTS.get(level),
+            'parser': dump_parser(parser),
+        }
+    with utils.atomic_write_file(filename) as f:
+        pickle.dump({'version': PARSER_ARTIFACT_VERSION, 'levels': levels}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_parser_artifact(filename=PARSER_ARTIFACT_FILE):
+    """Return the levels stored in the parser artifact, or {} if there is no usable artifact.
+
+    Only the outer dictionary is unpickled here, the parsers themselves are
+    unpickled on first use of their level.
+    """
+    global PARSER_ARTIFACT
+    if PARSER_ARTIFACT is None:
+        PARSER_ARTIFACT = {}
+        try:
+            with open(filename, 'rb') as f:
+                artifact = pickle.load(f)
+            if artifact.get('version') == PARSER_ARTIFACT_VERSION:
+                PARSER_ARTIFACT = artifact['levels']
+        except (IOError, pickle.UnpicklingError, EOFError) as e:
+            logger.info('No prebuilt parsers loaded from %s: %s', filename, e)
+    return PARSER_ARTIFACT
+
+
+def load_prebuilt_parser(level, grammar, mode):
+    """Return the prebuilt parser for this level if it was built from the same grammar, None otherwise."""
+    entry = load_parser_artifact().get(level)
+    if not entry or entry['hash'] != grammar_hash(grammar, mode):
+        return None
+    try:
+        parser = pickle.loads(entry['parser'])
+    except Exception as e:
+        # the hash does not cover our own classes in the parser, like the tree class,
+        # an artifact built before one of them was renamed or moved can't be loaded
+        logger.warning('Prebuilt parser for level %s could not be loaded, building it: %r', level, e)
+        return None
+    if entry['conflicts'] is not None:
+        LALR_CONFLICTS[level] = entry['conflicts']
+    return parser
 
 
 def get_parser(level):
     """Return the Lark parser for a given level.
 
-    Uses caching if Hedy is NOT running in development mode.
+    Parsers are built once per level and kept in PARSER_CACHE. If several
+    threads ask for a level that is not built yet, one of them builds it and
+    the others wait for it. In development mode the grammar is checked on every
+    call and the parser is rebuilt when one of its grammar files has changed.
     """
     key = str(level)
     existing = PARSER_CACHE.get(key)
     if existing and not utils.is_debug_mode():
-        return existing
-    grammar = create_grammar(level)
-    ret = Lark(grammar, regex=True)
-    PARSER_CACHE[key] = ret
-    return ret
+        return existing[2]
+
+    lock = parser_lock(key)
+    if not lock.acquire(blocking=False):
+        count_parser_wait()
+        lock.acquire()
+    try:
+        level = int(level)
+        mode = get_parser_mode(level)
+        grammar = create_grammar(level)
+        existing = PARSER_CACHE.get(key)
+        if existing and existing[0] == grammar and existing[1] == mode:
+            return existing[2]
+        parser = load_prebuilt_parser(level, grammar, mode) or create_parser(grammar, level, mode)
+        PARSER_CACHE[key] = (grammar, mode, parser)
+        return parser
+    finally:
+        lock.release()
+
+
+def parser_lock(key):
+    with PARSER_LOCKS_LOCK:
+        return PARSER_LOCKS[key]
+
+
+def count_parser_wait():
+    global PARSER_WAITS
+    with PARSER_LOCKS_LOCK:
+        PARSER_WAITS += 1
+    log_counter('parser_wait')
 
 ParseResult = namedtuple('ParseResult', ['code', 'has_turtle'])
 
-def transpile(input_string, level):
+
+class TranspileCache:
+    """A bounded LRU cache of transpile results, keyed by a hash of the program and its level.
+
+    Stores either the ParseResult or the HedyException a program resulted in,
+    so programs that fail are not transpiled over and over either. The memory
+    bound is approximate: we count the characters of the cached code and error
+    arguments plus a fixed overhead per entry.
+    """
+    ENTRY_OVERHEAD = 256
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(input_string, level):
+        normalized = input_string.replace('\r\n', '\n')
+        return hashlib.sha256(f'{level}\n{normalized}'.encode('utf-8')).digest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.ENTRY_OVERHEAD + len(str(value.code if isinstance(value, ParseResult) else vars(value)))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.size += size
+            self.evict()
+
+    def resize(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self.evict()
+
+    def evict(self):
+        # removes the least recently used entries until the cache fits, call with the lock held
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def copy_exception(ex):
+    """Return a shallow copy of a HedyException, without traceback.
+
+    Cached exceptions are handed out as copies because callers modify them
+    (f.e. app.parse_error_to_response translates character_found).
+    """
+    new = ex.__class__.__new__(ex.__class__)
+    new.__dict__.update(ex.__dict__)
+    new.args = ex.args
+    if hasattr(ex, 'arguments'):
+        new.arguments = dict(ex.arguments)
+    return new
+
+
+# the default size, the server sets the size from config['transpile-cache-mb']
+TRANSPILE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+TRANSPILE_CACHE = TranspileCache(TRANSPILE_CACHE_MAX_BYTES)
+
+
+# Transpilations of the code in the coursedata, written at deploy time by prebake.py.
+# Kids often run the start code of an adventure unchanged, /parse answers those
+# programs from this table without parsing them. The table is keyed by a hash of
+# the transpiler (this file, the grammars and Lark), so a stale table is ignored.
+PREBAKED_VERSION = 1
+PREBAKED_FILE = path.join(path.abspath(path.dirname(__file__)), 'grammars-Total', 'prebaked.pickle')
+PREBAKED = None
+
+
+def transpiler_hash():
+    """A hash of everything the Python code of a Hedy program depends on."""
+    grammar_dir = path.join(path.abspath(path.dirname(__file__)), 'grammars')
+    filenames = [path.abspath(__file__)] + [path.join(grammar_dir, f) for f in sorted(os.listdir(grammar_dir))]
+    h = hashlib.sha256(lark.__version__.encode('utf-8'))
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def save_prebaked_transpilations(programs, filename=PREBAKED_FILE):
+    """Transpile (level, code) programs and write the results to the prebaked table.
+
+    Returns the programs that could not be transpiled with their exception, these are
+    left out of the table.
+    """
+    transpilations = {}
+    failures = []
+    for level, code in programs:
+        try:
+            result = transpile_uncached(code, level)
+        except Exception as ex:
+            failures.append((level, code, ex))
+            continue
+        if result is not None:
+            transpilations[TranspileCache.key(code, level)] = tuple(result)
+    with utils.atomic_write_file(filename) as f:
+        pickle.dump({'version': PREBAKED_VERSION, 'hash': transpiler_hash(), 'transpilations': transpilations},
+                    f, protocol=pickle.HIGHEST_PROTOCOL)
+    return failures
+
+
+def load_prebaked_transpilations(filename=PREBAKED_FILE):
+    """Return the prebaked table, or {} if there is no table or it was made by another transpiler."""
+    global PREBAKED
+    if PREBAKED is None:
+        PREBAKED = {}
+        try:
+            with open(filename, 'rb') as f:
+                prebaked = pickle.load(f)
+            if prebaked.get('version') == PREBAKED_VERSION and prebaked.get('hash') == transpiler_hash():
+                PREBAKED = {key: ParseResult(*result) for key, result in prebaked['transpilations'].items()}
+            else:
+                logger.info('Prebaked transpilations in %s are stale, not loaded', filename)
+        except (IOError, pickle.UnpicklingError, EOFError) as e:
+            logger.info('No prebaked transpilations loaded from %s: %s', filename, e)
+    return PREBAKED
+
+
+# Seconds a call to transpile may take, None for no limit. Some programs make the
+# Earley parser try a lot of ways to read them, so they can take very long.
+TRANSPILE_TIMEOUT = None
+
+# the deadline of the transpile call running in this thread, see check_deadline
+DEADLINE = threading.local()
+
+
+@contextlib.contextmanager
+def transpile_deadline(seconds):
+    """Make check_deadline raise a TranspileTimeoutException after `seconds` in this thread."""
+    if seconds is None or getattr(DEADLINE, 'at', None) is not None:
+        # no limit, or we are inside a call that already has a deadline
+        yield
+        return
+    DEADLINE.at = time.perf_counter() + seconds
+    DEADLINE.seconds = seconds
+    try:
+        yield
+    finally:
+        DEADLINE.at = None
+
+
+def check_deadline():
+    at = getattr(DEADLINE, 'at', None)
+    if at is not None and time.perf_counter() > at:
+        raise TranspileTimeoutException(seconds=DEADLINE.seconds)
+
+
+class DeadlineText(str):
+    """The text of a program, that checks the deadline whenever the parser moves to the next character.
+
+    The Earley parser iterates over the characters of the program, and for every
+    character does the work for all the ways it can read the program up to there.
+    So when a program takes too long, we stop its parser at the next character
+    with a TranspileTimeoutException, in the thread that parses it: no other
+    thread or process has to be stopped or cleaned up.
+    """
+    def __iter__(self):
+        for c in str.__iter__(self):
+            check_deadline()
+            yield c
+
+
+def deadline_text(text):
+    # only pay for the checks when there is a deadline
+    if getattr(DEADLINE, 'at', None) is None:
+        return text
+    return DeadlineText(text)
+
+
+def transpile(input_string, level, timeout=None):
+    """Transpile a Hedy program, answering repeated programs from TRANSPILE_CACHE.
+
+    Raises a TranspileTimeoutException if it takes longer than `timeout`
+    seconds, which defaults to TRANSPILE_TIMEOUT.
+    """
+    with transpile_deadline(TRANSPILE_TIMEOUT if timeout is None else timeout):
+        try:
+            return transpile_cached(input_string, level)
+        except TranspileTimeoutException as ex:
+            # keep the program, so we can find out why it is so slow
+            logger.warning('Transpiling took longer than %ss at level %s: %r', ex.arguments['seconds'], level, input_string)
+            log_counter('transpile_timeout')
+            raise
+
+
+def transpile_cached(input_string, level):
+    # The cache is not used in development mode, where the grammars may change.
+    if utils.is_debug_mode():
+        return transpile_uncached(input_string, level)
+
+    key = TranspileCache.key(input_string, level)
+    prebaked = load_prebaked_transpilations().get(key)
+    if prebaked is not None:
+        log_counter('transpile_prebaked_hit')
+        return prebaked
+
+    cached = TRANSPILE_CACHE.get(key)
+    if cached is not None:
+        log_counter('transpile_cache_hit')
+        if isinstance(cached, HedyException):
+            raise copy_exception(cached)
+        return cached
+
+    log_counter('transpile_cache_miss')
+    try:
+        result = transpile_uncached(input_string, level)
+    except TranspileTimeoutException:
+        # whether a program is too slow depends on how busy we are, so we don't cache it
+        raise
+    except HedyException as ex:
+        TRANSPILE_CACHE.put(key, copy_exception(ex))
+        raise
+    if result is not None:
+        TRANSPILE_CACHE.put(key, result)
+    return result
+
+
+# how many levels below the level of a program we look for a level at which it is valid.
+# We parse the program at one of them: the closest level its keywords allow. So we only
+# look further down than the level below when the keywords rule out the levels in between.
+WRONG_LEVEL_SEARCH_DEPTH = 3
+
+
+def transpile_uncached(input_string, level):
+    detector = LevelDetector(input_string)
     try:
-        transpile_result = transpile_inner(input_string, level)
-        return transpile_result
+        return detector.transpile(level)
     except ParseException as ex:
-        # This is the 'fall back' transpilation
-        # that should surely be improved!!
+        # If the program is valid at a lower level, a better error is "wrong level"
         # we retry HedyExceptions of the type Parse (and Lark Errors) but we raise Invalids
-
-        #try 1 level lower
         if level > 1:
-            try:
-                new_level = level - 1
-                result = transpile_inner(input_string, new_level)
-            except (LarkError, HedyException) as innerE:
-                # Parse at `level - 1` failed as well, just re-raise original error
+            working_level = detector.highest_valid_level(below=int(level), lowest=int(level) - WRONG_LEVEL_SEARCH_DEPTH, tries=1)
+            if working_level is None:
                 raise ex
-            # If the parse at `level - 1` succeeded, then a better error is "wrong level"
-            raise WrongLevelException(correct_code=result.code, working_level=new_level, original_level=level) from ex
+            result = detector.result(working_level)
+            raise WrongLevelException(correct_code=result.code, working_level=working_level, original_level=level) from ex
 
 
 def repair(input_string):
@@ -1257,6 +2104,10 @@ def find_indent_length(line):
     return number_of_spaces
 
 def preprocess_blocks(code):
+    # programs without indented lines have no blocks to close, so they are used as is
+    if not code.startswith(' ') and '\n ' not in code:
+        return code
+
     processed_code = []
     lines = code.split("\n")
     current_number_of_indents = 0
@@ -1299,25 +2150,37 @@ def preprocess_blocks(code):
         processed_code.append('end-block')
     return "\n".join(processed_code)
 
+def original_line_number(code, line_number):
+    # the line number in the program as it was written of a line of the preprocessed code
+    # every end-block line before it was added by preprocess_blocks, an error on an
+    # end-block line is reported on the line before it, the last line of the block
+    return line_number - code.split('\n', line_number)[:line_number].count('end-block')
+
 def contains_blanks(code):
     return (" _ " in code) or (" _\n" in code)
 
-def transpile_inner(input_string, level):
+def prepare_program(input_string, level):
+    # checks and rewrites done on the program text before it is parsed
+    level = int(level)
+    return preprocess_program(normalise_program(input_string), level), level
+
+def normalise_program(input_string):
+    # the checks and rewrites that are the same for every level
     number_of_lines = input_string.count('\n')
 
-    #parser is not made for huge programs!
+    #long programs take long to parse (see parse_in_pieces), so we limit their size
     if number_of_lines > MAX_LINES:
         raise InputTooBigException(lines_of_code=number_of_lines, max_lines=MAX_LINES)
 
     input_string = input_string.replace('\r\n', '\n')
-    punctuation_symbols = ['!', '?', '.']
-    level = int(level)
-    parser = get_parser(level)
 
     if contains_blanks(input_string):
         raise CodePlaceholdersPresentException()
 
+    return input_string
 
+def preprocess_program(input_string, level):
+    # the rewrites that depend on the level, see preprocess_key for which levels share them
     if level >= 3:
         input_string = input_string.replace("\\", "\\\\")
 
@@ -1325,23 +2188,20 @@ def transpile_inner(input_string, level):
     if level >= 7:
         input_string = preprocess_blocks(input_string)
 
-    try:
-        program_root = parser.parse(input_string+ '\n').children[0]  # getting rid of the root could also be done in the transformer would be nicer
-        abstract_syntaxtree = ExtractAST().transform(program_root)
-        lookup_table = AllAssignmentCommands().transform(abstract_syntaxtree)
-
-        # also add hashes to list
-        # note that we do not (and cannot) hash the var names only, we also need to be able to process
-        # random.choice(প্রাণী)
-        hashed_lookups = AllAssignmentCommandsHashed().transform(abstract_syntaxtree)
+    return input_string
 
-        if lookup_table != hashed_lookups:
-            print(lookup_table, hashed_lookups)
-        lookup_table += hashed_lookups
+def preprocess_key(level):
+    # levels with the same key get the same program text from preprocess_program
+    return level >= 3, level >= 7
 
+def parse_program(parser, input_string, level, line_offset=0):
+    # returns the program node of the parse tree
+    # line_offset is added to the line numbers of errors, for when input_string is only part of a program
+    try:
+        return parser.parse(deadline_text(input_string+ '\n')).children[0]  # getting rid of the root could also be done in the transformer would be nicer
     except UnexpectedCharacters as e:
         try:
-            location = e.line, e.column
+            location = error_line_number(input_string, level, e.line) + line_offset, e.column
             characters_expected = str(e.allowed) #not yet in use, could be used in the future (when our parser rules are better organize, now it says ANON*__12 etc way too often!)
             character_found  = beautify_parse_error(e.char)
             # print(e.args[0])
@@ -1350,9 +2210,142 @@ def transpile_inner(input_string, level):
         except UnexpectedEOF:
             # this one can't be beautified (for now), so give up :)
             raise e
+    except UnexpectedToken as e:
+        # the LALR parser reports the token it did not expect rather than a character
+        location = error_line_number(input_string, level, e.line) + line_offset, e.column
+        character_found = beautify_parse_error(str(e.token)[:1])
+        raise ParseException(level=level, location=location, character_found=character_found) from e
+
+# programs of more than PARSE_WHOLE_LINES lines are parsed in pieces of about
+# PARSE_PIECE_LINES lines. The Earley parser keeps the state of every character until
+# it is done, about 0.3MB per line, and gets slower per line as the text gets longer,
+# while the state of a piece is freed once it has been parsed.
+PARSE_WHOLE_LINES = 100
+PARSE_PIECE_LINES = 50
+
+# the pieces of a program parsed in one go (from first to last), with the children of their
+# program node and the visit results of those (see TreeAnalysis.visit). error is the exception
+# if they did not parse. failure is None if they parsed and IsValid and IsComplete found no
+# error, otherwise it tells what went wrong, so we can see if joining pieces changes that
+ParsedPieces = namedtuple('ParsedPieces', ['first', 'last', 'children', 'visited', 'error', 'failure'])
+
+def parse_in_pieces(parser, analyser, input_string, level):
+    # returns the program node of the parse tree and the visit results of its children
+    if input_string.count('\n') < PARSE_WHOLE_LINES:
+        pieces = [input_string]
+    else:
+        pieces = split_into_pieces(input_string, level)
+    line_offsets = [0]
+    for piece in pieces:
+        line_offsets.append(line_offsets[-1] + error_line_number(piece, level, piece.count('\n') + 1))
+
+    def parse(first, last):
+        text = '\n'.join(pieces[first:last + 1])
+        try:
+            children = parse_program(parser, text, level, line_offsets[first]).children
+        except TranspileTimeoutException:
+            raise
+        except (LarkError, HedyException) as ex:
+            # errors of Lark have no location in the program, those never count as the same error
+            location = getattr(ex, 'location', None)
+            return ParsedPieces(first, last, None, None, ex, (type(ex), location) if location else ex)
+        visited = [analyser.visit(c) for c in children]
+        failure = None
+        if len(pieces) > 1:
+            analysis = analyser.analyse_visited(HedyTree('program', children), visited)
+            if not analysis.is_valid[0]:
+                failure = ('invalid', analysis.is_valid[1])
+            elif not analysis.is_complete[0]:
+                failure = ('incomplete', analysis.is_complete[1])
+        return ParsedPieces(first, last, children, visited, None, failure)
+
+    parsed = []
+    i = 0
+    while i < len(pieces):
+        result = parse(i, i)
+        if result.failure is not None:
+            # Our grammars are ambiguous and Earley does not always resolve the ambiguity of
+            # a piece on its own as it does in the whole program. F.e. an else on the line after
+            # an if can be an invalid command instead. So we parse a piece with an error again
+            # together with the piece before and/or after it. We join at most three pieces,
+            # so a program with errors is parsed in bounded memory as well, and we stop when
+            # joined pieces fail the same way, then the error is a real one. If they all fail, the
+            # widest one reports the error, a piece on its own can f.e. end in the middle of a line
+            # Earley was still parsing.
+            previous = parsed and parsed[-1].first == parsed[-1].last == i - 1
+            windows = [(i - 1, i)] if previous else []
+            if i + 1 < len(pieces):
+                windows += [(i, i + 1)] + ([(i - 1, i + 1)] if previous else [])
+            for first, last in windows:
+                retry = parse(first, last)
+                if retry.failure is None:
+                    if first < i:
+                        parsed.pop()
+                    result = retry
+                    break
+                if result.error is not None and retry.error is not None:
+                    result = result._replace(error=retry.error)
+                if retry.failure == result.failure:
+                    break
+        if result.error is not None:
+            raise result.error
+        parsed.append(result)
+        i = result.last + 1
+
+    children = [child for result in parsed for child in result.children]
+    visited = [v for result in parsed for v in result.visited]
+    return HedyTree('program', children), visited
+
+def split_into_pieces(code, level):
+    # joins the chunks of split_into_chunks into pieces of at least PARSE_PIECE_LINES lines
+    pieces = []
+    piece = []
+    number_of_lines = 0
+    for chunk in split_into_chunks(code, level):
+        piece.append(chunk)
+        number_of_lines += chunk.count('\n') + 1
+        if number_of_lines >= PARSE_PIECE_LINES:
+            pieces.append('\n'.join(piece))
+            piece = []
+            number_of_lines = 0
+    if piece:
+        pieces.append('\n'.join(piece))
+    return pieces
+
+def error_line_number(input_string, level, line_number):
+    # from level 7 on the parser sees the code with the end-blocks preprocess_blocks added
+    if level >= 7:
+        return original_line_number(input_string, line_number)
+    return line_number
+
+def transpile_inner(input_string, level):
+    input_string, level = prepare_program(input_string, level)
+    return transpile_prepared(input_string, level)
+
+def transpile_prepared(input_string, level):
+    # parses and transpiles a program that went through prepare_program
+    # one walk over the tree for the AST, the variables and all checks
+    analyser = TreeAnalysis(level)
+    program_root, visited = parse_in_pieces(get_parser(level), analyser, input_string, level)
+    analysis = analyser.analyse_visited(program_root, visited)
+    return transpile_analysed(analysis, program_root, input_string, level)
+
+def transpile_analysed(analysis, program_root, input_string, level):
+    # raises the errors found by the analysis of the program, or generates the Python code
+    punctuation_symbols = ['!', '?', '.']
+    abstract_syntaxtree = analysis.ast
+    lookup_table = analysis.lookup
+
+    # also add hashes to list
+    # note that we do not (and cannot) hash the var names only, we also need to be able to process
+    # random.choice(প্রাণী)
+    hashed_lookups = analysis.hashed_lookup
+    # from level 6 on we know which variables always hold an int, so we don't convert them over and over
+    numbers = numeric_variables(abstract_syntaxtree, level) if level >= 6 else ()
+    lookup_table = SymbolTable(lookup_table + hashed_lookups, numbers)
 
     # IsValid returns (True,) or (False, args, line)
-    is_valid = IsValid().transform(program_root)
+    is_valid = analysis.is_valid
 
     if not is_valid[0]:
         _, args, line = is_valid
@@ -1375,13 +2368,13 @@ def transpile_inner(input_string, level):
             raise EmptyProgramException()
         else:
             invalid_command = args
-            closest = closest_command(invalid_command, commands_per_level[level])
+            closest = suggested_command(invalid_command, level)
             if closest == None: #we couldn't find a suggestion because the command itself was found
                 # clearly the error message here should be better or it should be a different one!
                 raise ParseException(level=level, location=["?", "?"], keyword_found=invalid_command)
             raise InvalidCommandException(invalid_command=invalid_command, level=level, guessed_command=closest)
 
-    is_complete = IsComplete(level).transform(program_root)
+    is_complete = analysis.is_complete
     if not is_complete[0]:
         incomplete_command = is_complete[1][0]
         line = is_complete[2]
@@ -1405,15 +2398,368 @@ def transpile_inner(input_string, level):
         else:
             raise E
 
-    has_turtle = UsesTurtle().transform(program_root)
+    has_turtle = analysis.has_turtle
 
     return ParseResult(python, has_turtle)
 
+CommandStarts = namedtuple('CommandStarts', ['keywords', 'assign_words', 'complete'])
+
+# level -> (grammar rules, CommandStarts) for the levels we have looked at
+COMMAND_STARTS_CACHE = {}
+
+GRAMMAR_SYMBOL = re.compile(r'"[^"]*"|/[^/]*/|->|[A-Za-z_][A-Za-z_0-9]*|[()|*+?]')
+
+
+def rule_alternatives(rule):
+    # the alternatives of a grammar rule as lists of symbols, without comments and aliases
+    symbols = GRAMMAR_SYMBOL.findall(rule.split(':', 1)[1].split('//')[0])
+    alternatives = [[]]
+    depth = 0
+    skip_alias = False
+    for symbol in symbols:
+        if skip_alias:
+            skip_alias = False
+        elif symbol == '->':
+            skip_alias = True
+        elif symbol == '|' and depth == 0:
+            alternatives.append([])
+        else:
+            depth += {'(': 1, ')': -1}.get(symbol, 0)
+            alternatives[-1].append(symbol)
+    return alternatives
+
+
+def terminal_text(rules, name):
+    # the text a terminal matches, if it is defined by a single string like _FOR: "for"
+    rule = rules.get(name)
+    match = re.fullmatch(r'\s*"([^"]+)"\s*', rule.split(':', 1)[1]) if rule else None
+    return match.group(1) if match else None
+
+
+def add_command_starts(rules, symbols, starts, seen):
+    # collects the ways a sequence of symbols can start into starts
+    # returns False if it can start in a way we cannot describe with words
+    first = symbols[0] if symbols else None
+    if first is None or first in '(|*+?' or (len(symbols) > 1 and symbols[1] in '*?'):
+        return False
+    if first.startswith('invalid'):
+        return True  # these are errors anyway, see IsValid
+    if first in ['var', 'NAME']:
+        second = symbols[1] if len(symbols) > 1 else None
+        if second == '_SPACE' and len(symbols) > 2 and terminal_text(rules, symbols[2]):
+            starts.assign_words.add(terminal_text(rules, symbols[2]))
+            return True
+        # something like var[1] is a single word, so the command does not start with a keyword
+        return second != '_SPACE' and bool(terminal_text(rules, second))
+    if first[0] == '_' or first.isupper():
+        text = terminal_text(rules, first)
+        if text and text.isalpha():
+            starts.keywords.add(text)
+        # terminals like _HASH do not start with a letter, so they do not start with a keyword either
+        return bool(text) and not text[0].isspace()
+    if first in seen or first not in rules:
+        return False
+    complete = [add_command_starts(rules, alternative, starts, seen | {first})
+                for alternative in rule_alternatives(rules[first])]
+    return all(complete)
+
+
+def get_command_starts(level):
+    """Return how the commands of a level can start, worked out from its grammar.
+
+    keywords are the words a command can start with, like 'print' or 'for'.
+    assign_words are the words that can follow a variable name at the start
+    of a command, like 'is' in 'name is Hedy'. If the grammar has commands that
+    start in another way, complete is False.
+    """
+    rules, _ = get_grammar_for_level(level)
+    cached = COMMAND_STARTS_CACHE.get(level)
+    if cached and cached[0] is rules:
+        return cached[1]
+
+    named_rules = {name.strip(): rule for name, rule in rules.items()}
+    starts = CommandStarts(set(), set(), True)
+    complete = add_command_starts(named_rules, ['command'], starts, frozenset())
+    starts = starts._replace(complete=complete)
+    COMMAND_STARTS_CACHE[level] = (rules, starts)
+    return starts
+
+
+def possible_levels(input_string, levels=None):
+    """Return the levels (of the given levels) a program could be valid at, judged by its keywords.
+
+    A line that starts with a keyword that no command starts with at a level
+    cannot be parsed at that level, unless the keyword is used as a variable
+    name, like in 'for is 5'.
+    """
+    levels = range(1, HEDY_MAX_LEVEL + 1) if levels is None else levels
+    command_starts = {level: get_command_starts(level) for level in levels}
+    all_keywords = set().union(*(starts.keywords for starts in command_starts.values()))
+
+    line_starts = set()
+    for line in input_string.split('\n'):
+        words = line.split()
+        if words and words[0] in all_keywords:
+            line_starts.add((words[0], words[1] if len(words) > 1 else None))
+
+    def possible(starts):
+        return not starts.complete or all(keyword in starts.keywords or next_word in starts.assign_words
+                                          for keyword, next_word in line_starts)
+
+    return [level for level in levels if possible(command_starts[level])]
+
+
+class LevelDetector:
+    """Finds the levels at which a program is valid.
+
+    The program is normalised once, preprocessed once for every group of levels
+    that preprocess it in the same way, and every level is transpiled at most
+    once. Levels at which the keywords of the program cannot be parsed are
+    skipped without parsing.
+    """
+    def __init__(self, input_string):
+        self.input_string = input_string
+        self.normalised = None
+        self.error = None
+        try:
+            self.normalised = normalise_program(input_string)
+        except HedyException as ex:
+            self.error = ex
+        self.preprocessed = {}
+        self.results = {}
+        self.candidates = None
+
+    def preprocess(self, level):
+        if self.error is not None:
+            raise copy_exception(self.error)
+        key = preprocess_key(level)
+        if key not in self.preprocessed:
+            try:
+                self.preprocessed[key] = preprocess_program(self.normalised, level)
+            except HedyException as ex:
+                self.preprocessed[key] = ex
+        preprocessed = self.preprocessed[key]
+        if isinstance(preprocessed, HedyException):
+            raise copy_exception(preprocessed)
+        return preprocessed
+
+    def transpile(self, level):
+        """Transpile the program at a level, raising the error if it is not valid there."""
+        level = int(level)
+        if level in self.results:
+            result = self.results[level]
+            if isinstance(result, HedyException):
+                raise copy_exception(result)
+            return result
+        try:
+            result = transpile_prepared(self.preprocess(level), level)
+        except TranspileTimeoutException:
+            # whether a program is too slow depends on how busy we are, so we don't keep it
+            raise
+        except HedyException as ex:
+            self.results[level] = copy_exception(ex)
+            raise
+        self.results[level] = result
+        return result
+
+    def result(self, level):
+        # the ParseResult of a level or None if the program is not valid at that level
+        try:
+            return self.transpile(level)
+        except TranspileTimeoutException:
+            # we don't know if it is valid, the caller has to give up
+            raise
+        except (LarkError, HedyException):
+            return None
+
+    def possible_levels(self):
+        if self.candidates is None:
+            self.candidates = [] if self.error else possible_levels(self.normalised)
+        return self.candidates
+
+    def valid_levels(self):
+        """Return the sorted list of levels at which the program is valid."""
+        return [level for level in self.possible_levels() if self.result(level) is not None]
+
+    def lowest_valid_level(self):
+        return next((level for level in self.possible_levels() if self.result(level) is not None), None)
+
+    def highest_valid_level(self, below=HEDY_MAX_LEVEL + 1, lowest=1, tries=None):
+        """Return the highest level from lowest up to below at which the program is valid, or None.
+
+        With tries, the program is parsed at no more than the `tries` highest levels
+        its keywords allow.
+        """
+        candidates = [level for level in self.possible_levels() if lowest <= level < below]
+        candidates = list(reversed(candidates))[:tries]
+        return next((level for level in candidates if self.result(level) is not None), None)
+
+
+def valid_levels(input_string):
+    """Return the sorted list of levels at which a Hedy program is valid."""
+    return LevelDetector(input_string).valid_levels()
+
+
+def split_into_chunks(code, level):
+    """Split a (preprocessed) program into chunks that can be parsed on their own.
+
+    Up to level 6 every line is a chunk, from level 7 on every top-level block is.
+    Empty lines stay with the chunk before them, and else and elif lines are part
+    of the chunk of their if.
+    """
+    chunks = []
+    for line in code.split('\n'):
+        continues_chunk = line == '' or line.startswith('else') or (
+            level >= 7 and (line.startswith(' ') or line.startswith('end-block') or line.startswith('elif')))
+        if chunks and continues_chunk:
+            chunks[-1].append(line)
+        else:
+            chunks.append([line])
+    return ['\n'.join(lines) for lines in chunks]
+
+class IncrementalTranspiler:
+    """Transpiles successive versions of a program that is being edited.
+
+    The program is split into chunks (see split_into_chunks). The parse trees and
+    analysis results of the chunks are kept, so after an edit only the chunks that
+    changed are parsed again. The results are then combined and Python is generated
+    for the whole program, the result is the same as that of transpile.
+
+    Usage:
+
+        transpiler = IncrementalTranspiler(level)
+        result = transpiler.transpile(code)
+        result = transpiler.transpile(edited_code)
+    """
+    def __init__(self, level):
+        self.level = int(level)
+        # chunk text -> (children of the program node, visit results of those children)
+        self.chunks = {}
+        self.chunks_parsed = 0
+
+    def transpile(self, input_string):
+        try:
+            return self.transpile_chunks(input_string)
+        except HedyException:
+            # Our grammars are ambiguous and Earley does not always resolve the ambiguity
+            # of a chunk the same way on its own as it does in the whole program. F.e. an
+            # else on the line after an if can be an invalid command instead. So errors
+            # are always confirmed by the regular transpile, which also finds out if the
+            # program was written for an earlier level.
+            return transpile(input_string, self.level)
+
+    def transpile_chunks(self, input_string):
+        code, level = prepare_program(input_string, self.level)
+        parser = get_parser(level)
+        analyser = TreeAnalysis(level)
+
+        chunks = {}
+        children = []
+        visited_children = []
+        line_offset = 0
+        try:
+            for chunk in split_into_chunks(code, level):
+                if chunk not in chunks:
+                    chunks[chunk] = self.chunks.get(chunk) or self.parse_chunk(parser, analyser, chunk, level, line_offset)
+                chunk_children, chunk_visited = chunks[chunk]
+                children += chunk_children
+                visited_children += chunk_visited
+                line_offset += original_line_number(chunk, chunk.count('\n') + 1)
+        finally:
+            # only keep the chunks of the latest version of the program
+            self.chunks = chunks
+
+        program_root = HedyTree('program', children)
+        analysis = analyser.analyse_visited(program_root, visited_children)
+        return transpile_analysed(analysis, program_root, code, level)
+
+    def parse_chunk(self, parser, analyser, chunk, level, line_offset):
+        self.chunks_parsed += 1
+        children = parse_program(parser, chunk, level, line_offset).children
+        return children, [analyser.visit(c) for c in children]
+
+# result of transpile_many for one item: its position in the input, and either
+# the ParseResult or the exception raised while transpiling it
+BatchResult = namedtuple('BatchResult', ['index', 'result', 'error', 'transpile_time'])
+
+def transpile_batch(batch):
+    # runs in the worker processes of transpile_many
+    results = []
+    for index, code, level in batch:
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = transpile(code, level)
+        except Exception as e:
+            error = e
+        transpile_time = time.perf_counter() - start
+
+        if error is not None and not isinstance(error, HedyException):
+            # Lark exceptions can't always be pickled to send them back to the parent process
+            try:
+                pickle.dumps(error)
+            except Exception:
+                error = RuntimeError(f'{type(error).__name__}: {error}')
+        results.append(BatchResult(index, result, error, transpile_time))
+    return results
+
+def batches_of(items, size):
+    batch = []
+    for index, (code, level) in enumerate(items):
+        batch.append((index, code, level))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def transpile_many(items, workers=None, ordered=True, batch_size=20):
+    """Transpile many (code, level) pairs on a pool of worker processes.
+
+    Yields a BatchResult per item, in the order of `items` if ordered is True and
+    as soon as they are done otherwise. Exceptions are returned, not raised, so one
+    failing program does not stop the others. Items are read lazily and sent to the
+    workers in batches, with a bounded number of batches in flight, so `items` can be
+    a generator over a huge number of programs.
+
+    Every worker process keeps its parsers (and transpile cache) for all the items
+    it handles. workers defaults to the number of CPUs, use workers=0 to transpile
+    in the current process instead.
+    """
+    batches = batches_of(items, batch_size)
+    if workers == 0:
+        for batch in batches:
+            yield from transpile_batch(batch)
+        return
+
+    workers = workers or os.cpu_count()
+    max_in_flight = workers * 4
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        if ordered:
+            in_flight = collections.deque()
+            for batch in batches:
+                in_flight.append(executor.submit(transpile_batch, batch))
+                if len(in_flight) >= max_in_flight:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+        else:
+            in_flight = set()
+            for batch in batches:
+                in_flight.add(executor.submit(transpile_batch, batch))
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+            for future in concurrent.futures.as_completed(in_flight):
+                yield from future.result()
+
 def execute(input_string, level):
+    """Run a Hedy program in this process. Returns the HeadlessTurtle it drew with, if it uses the turtle."""
     python = transpile(input_string, level)
-    if python.has_turtle:
-        raise HedyException("hedy.execute doesn't support turtle")
-    exec(python.code)
+    turtle = turtletrace.HeadlessTurtle()
+    exec(python.code, turtletrace.program_globals(turtle))
+    return turtle if python.has_turtle else None
 
 # f = open('output.py', 'w+')
 # f.write(python)
@@ -0,0 +1,109 @@
+"""Transpile the code in the coursedata at deploy time, and check that it is valid.
+
+Kids often run the start code of an adventure or an example of a level
+without changing it. We transpile every code snippet of the adventures,
+level defaults and quizzes of all languages once, and store the Python code
+in a table keyed by a hash of the program and its level (see
+hedy.PREBAKED_FILE), so /parse answers these programs without parsing them.
+
+The code of the adventures and level defaults has to be valid, like
+tests_z_adventures and tests_z_defaults check: if it is not, we report it
+and exit with status 1. Quiz code is often wrong on purpose, invalid quiz
+code is only left out of the table.
+
+    python prebake.py
+"""
+import glob
+import sys
+from collections import namedtuple
+from os import path
+
+import hedy
+import utils
+from website.yaml_file import YamlFile
+
+COURSEDATA = path.join(path.abspath(path.dirname(__file__)), 'coursedata')
+
+# checked: whether the snippet has to be valid
+Snippet = namedtuple('Snippet', ['level', 'code', 'where', 'checked'])
+
+
+def coursedata_snippets(languages=None):
+    """The code snippets in the coursedata of the languages (all by default), as Snippets."""
+    if languages is None:
+        languages = sorted(path.basename(f)[:-len('.yaml')]
+                           for f in glob.glob(path.join(COURSEDATA, 'adventures', '*.yaml')))
+    snippets = []
+    for language in languages:
+        snippets.extend(level_defaults_snippets(language))
+        snippets.extend(adventure_snippets(language))
+    snippets.extend(quiz_snippets())
+    return [snippet for snippet in snippets if snippet.code and snippet.code.strip()]
+
+
+def level_defaults_snippets(language):
+    filename = path.join(COURSEDATA, 'level-defaults', f'{language}.yaml')
+    for level, data in YamlFile.for_file(filename).items():
+        where = f'{language}: level #{level}'
+        yield Snippet(int(level), data.get('start_code'), f'{where} - start_code', True)
+        for command in data.get('commands', []):
+            yield Snippet(int(level), command.get('demo_code'), f'{where} - command {command.get("name", "")} demo_code', True)
+        for i, code in enumerate(pre_snippets(data.get('intro_text', '')), start=1):
+            yield Snippet(int(level), code, f'{where} - intro_text snippet #{i}', True)
+
+
+def adventure_snippets(language):
+    filename = path.join(COURSEDATA, 'adventures', f'{language}.yaml')
+    for adventure in YamlFile.for_file(filename).get('adventures', {}).values():
+        for level, data in adventure['levels'].items():
+            where = f'{language}: adventure {adventure["name"]} - level #{level}'
+            yield Snippet(int(level), data.get('start_code'), f'{where} - start_code', True)
+            for i, code in enumerate(pre_snippets(data.get('story_text', '')), start=1):
+                yield Snippet(int(level), code, f'{where} - story_text snippet #{i}', True)
+
+
+def quiz_snippets():
+    for filename in sorted(glob.glob(path.join(COURSEDATA, 'quiz', '*.yaml'))):
+        quiz = YamlFile.for_file(filename)
+        if 'level' not in quiz:
+            continue
+        level = int(quiz['level'])
+        for question in quiz.get('questions', []):
+            for nr, data in question.items():
+                where = f'{path.basename(filename)}: question {nr}'
+                yield Snippet(level, data.get('code'), f'{where} code', False)
+                for option in data.get('mp_choice_options') or []:
+                    yield Snippet(level, option.get('code'), f'{where} option code', False)
+
+
+def pre_snippets(markdown):
+    """The code in the <pre> blocks of a markdown text."""
+    for tag in utils.markdown_to_html_tags(markdown):
+        if tag.name == 'pre' and tag.contents and tag.contents[0].contents:
+            yield str(tag.contents[0].contents[0])
+
+
+def is_error(snippet, ex):
+    # code with blanks is ok, kids fill those in
+    return snippet.checked and not isinstance(ex, hedy.CodePlaceholdersPresentException)
+
+
+def main():
+    snippets = coursedata_snippets()
+    # the same program is in many places (and languages), we transpile it once
+    programs = list(dict.fromkeys((snippet.level, snippet.code) for snippet in snippets))
+    failures = {(level, code): ex for level, code, ex in hedy.save_prebaked_transpilations(programs)}
+
+    errors = 0
+    for snippet in snippets:
+        ex = failures.get((snippet.level, snippet.code))
+        if ex is not None and is_error(snippet, ex):
+            errors += 1
+            print(f'{snippet.where}. Error: {ex.args[0] if ex.args else ex!r}')
+    print(f'Transpiled {len(programs) - len(failures)} of {len(programs)} programs, '
+          f'{errors} code snippets in the coursedata are not valid')
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
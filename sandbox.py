@@ -0,0 +1,406 @@
+"""Run transpiled Hedy programs on the server, in a pool of isolated worker processes with resource limits.
+
+hedy.execute runs a program in the process that calls it, so a program that
+loops forever or fills the memory takes that process with it. This pool
+starts its workers once, and every worker runs one program at a time with:
+
+- a limit on the CPU time of every program (a timer signal stops it);
+- a limit on the memory of the worker (RLIMIT_AS, on top of what it uses at start);
+- a limit on the size of the output;
+- a limit on the wall time, after which the pool kills the worker and starts a new one;
+- the answers to `ask` given upfront, instead of a keyboard.
+
+A program can get at every builtin (f.e. through the subclasses of object)
+even though it only gets the ones transpiled programs use, so the workers
+are isolated as well, before they run anything:
+
+- they are started fresh (spawned, not forked), so they have no copy of
+  the memory of the server, and they get no environment variables;
+- they run in a chroot to an empty, removed directory, so there are no files;
+- they run as a user of their own without any privileges, so they can't
+  undo any of this or signal the server or each other;
+- every file descriptor but the one to the pool is /dev/null or closed, and
+  RLIMIT_NOFILE keeps them from opening new ones, so no files and no sockets;
+- RLIMIT_NPROC keeps them from starting processes.
+
+A chroot and another user need root, so the pool has to be started by
+root (f.e. in its own container). Where that is not possible the pool raises
+IsolationUnavailable, unless it is made with isolate=False, which is only
+for code we trust, like the transpiled programs of the coursedata or of our
+own tests.
+
+Workers keep the compiled code of the programs they ran, keyed by a hash of
+the code, so a program that is run over and over (like the example code of
+an adventure with many sets of answers) is compiled once per worker.
+
+    with sandbox.SandboxPool(workers=4) as pool:
+        result = pool.run("naam is ask 'Hoe heet jij?'\\nprint 'Hallo ' naam", 4, answers=['Hedy'])
+        results = pool.run_many([(code, level, answers), ...])
+
+Programs that use the turtle draw on a turtletrace.HeadlessTurtle, which
+is part of their result.
+"""
+import builtins
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
+import io
+import multiprocessing
+import os
+import queue
+import signal
+import tempfile
+import threading
+from collections import namedtuple
+
+try:
+    import resource
+except ImportError:
+    # Windows has no resource limits, workers only get the limits we enforce ourselves
+    resource = None
+
+import hedy
+import turtletrace
+
+# default limits for a single program
+CPU_SECONDS = 2
+WALL_SECONDS = 5
+MEMORY_BYTES = 64 * 1024 * 1024
+OUTPUT_BYTES = 64 * 1024
+
+# isolated workers run as user (and group) FIRST_WORKER_UID, FIRST_WORKER_UID + 1, ...
+# These ids should not belong to anyone else on the server
+FIRST_WORKER_UID = 200000
+
+# how many compiled programs a worker keeps
+COMPILED_CACHE_SIZE = 1024
+
+Limits = namedtuple('Limits', ['cpu_seconds', 'wall_seconds', 'memory_bytes', 'output_bytes'])
+DEFAULT_LIMITS = Limits(CPU_SECONDS, WALL_SECONDS, MEMORY_BYTES, OUTPUT_BYTES)
+
+# error is None if the program ran to its end, or one of the errors below or
+# the name and message of the exception the program raised, f.e. 'ZeroDivisionError: division by zero'.
+# turtle is the HeadlessTurtle of a program that uses the turtle, None otherwise
+ExecutionResult = namedtuple('ExecutionResult', ['output', 'error', 'turtle'])
+CPU_TIME_EXCEEDED = 'cpu_time_exceeded'
+WALL_TIME_EXCEEDED = 'wall_time_exceeded'
+MEMORY_EXCEEDED = 'memory_exceeded'
+OUTPUT_EXCEEDED = 'output_exceeded'
+NOT_ENOUGH_ANSWERS = 'not_enough_answers'
+WORKER_DIED = 'worker_died'
+
+# the builtins transpiled programs use, and the exceptions they may raise. This keeps
+# mistakes out, not attackers, that is what the isolation is for
+PROGRAM_BUILTINS = ['print', 'input', 'int', 'str', 'float', 'bool', 'list', 'range', 'len', 'type',
+                 'abs', 'round', 'min', 'max', 'True', 'False', 'None',
+                 'Exception', 'ValueError', 'TypeError', 'NameError', 'IndexError', 'ZeroDivisionError']
+
+
+class IsolationUnavailable(Exception):
+    pass
+
+
+class CpuTimeExceeded(Exception):
+    pass
+
+
+class OutputExceeded(Exception):
+    pass
+
+
+class NotEnoughAnswers(Exception):
+    pass
+
+
+class LimitedOutput(io.StringIO):
+    """Collects the output of a program, and stops the program when there is too much of it."""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.size = 0
+
+    def write(self, s):
+        self.size += len(s)
+        if self.size > self.limit:
+            raise OutputExceeded()
+        return super().write(s)
+
+
+def program_hash(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+class Worker:
+    """The side of a worker process: compiles and runs the programs it receives, one at a time."""
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.compiled = collections.OrderedDict()
+
+    def start(self, connection, uid):
+        """Set the limits, and isolate the worker if it has a uid to run as."""
+        signal.signal(signal.SIGPROF, self.on_cpu_timer)
+        if resource is None:
+            return
+        # the worker uses some memory before it runs anything, so we allow that much and then the limit.
+        # This reads /proc, so it comes before the chroot
+        limit = address_space_size() + self.limits.memory_bytes
+        if uid is not None:
+            isolate(connection, uid)
+        # soft and hard limit, so a program that gets at the resource module can't raise it
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard == resource.RLIM_INFINITY or limit < hard:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    @staticmethod
+    def on_cpu_timer(signum, frame):
+        raise CpuTimeExceeded()
+
+    def compile(self, key, code):
+        compiled = self.compiled.get(key)
+        if compiled is None:
+            compiled = compile(code, '<hedy>', 'exec')
+            self.compiled[key] = compiled
+            if len(self.compiled) > COMPILED_CACHE_SIZE:
+                self.compiled.popitem(last=False)
+        else:
+            self.compiled.move_to_end(key)
+        return compiled
+
+    def run(self, key, code, answers, has_turtle):
+        output = LimitedOutput(self.limits.output_bytes)
+        turtle = turtletrace.HeadlessTurtle() if has_turtle else None
+        try:
+            compiled = self.compile(key, code)
+            program_globals = self.program_globals(output, answers, turtle)
+            with contextlib.redirect_stdout(output):
+                signal.setitimer(signal.ITIMER_PROF, self.limits.cpu_seconds)
+                try:
+                    exec(compiled, program_globals)
+                finally:
+                    signal.setitimer(signal.ITIMER_PROF, 0)
+            error = None
+        except CpuTimeExceeded:
+            error = CPU_TIME_EXCEEDED
+        except MemoryError:
+            error = MEMORY_EXCEEDED
+        except OutputExceeded:
+            error = OUTPUT_EXCEEDED
+        except NotEnoughAnswers:
+            error = NOT_ENOUGH_ANSWERS
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        return ExecutionResult(output.getvalue(), error, turtle)
+
+    @staticmethod
+    def program_globals(output, answers, turtle):
+        answers = iter(answers)
+
+        def scripted_input(prompt=''):
+            # like input() when stdin is not a terminal: the prompt is output, the answer is not
+            output.write(str(prompt))
+            try:
+                return next(answers)
+            except StopIteration:
+                raise NotEnoughAnswers() from None
+
+        program_builtins = {name: getattr(builtins, name) for name in PROGRAM_BUILTINS}
+        program_builtins['input'] = scripted_input
+        # the time module of these globals does not sleep, that would only keep the worker from the next program
+        return dict(turtletrace.program_globals(turtle), __builtins__=program_builtins)
+
+
+def address_space_size():
+    """The virtual memory of this process in bytes, 0 where /proc/self/status is not available."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmSize:'):
+                    return int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    return 0
+
+
+def can_isolate():
+    return resource is not None and hasattr(os, 'chroot') and os.geteuid() == 0
+
+
+def isolate(connection, uid):
+    """Take everything from this process that a program does not need, see the docstring of this module."""
+    os.environ.clear()
+    # the lowest free file descriptor is the one a new file or socket gets, so we fill the ones
+    # below the connection with /dev/null, close the ones above it, and allow no more than that
+    keep = connection.fileno()
+    null = os.open(os.devnull, os.O_RDWR)
+    for fd in range(keep):
+        if fd != null:
+            os.dup2(null, fd)
+    if null > keep:
+        os.close(null)
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    os.closerange(keep + 1, soft if soft != resource.RLIM_INFINITY else 65536)
+
+    # the root becomes an empty directory that is already removed, so not even root can add files to it
+    jail = tempfile.mkdtemp(prefix='hedy-worker-')
+    os.chdir(jail)
+    os.rmdir(jail)
+    os.chroot('.')
+    os.chdir('/')
+    os.setgroups([])
+    os.setgid(uid)
+    os.setuid(uid)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (keep + 1, keep + 1))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def worker_main(connection, limits, uid):
+    worker = Worker(limits)
+    try:
+        worker.start(connection, uid)
+    except OSError as e:
+        connection.send(f'{type(e).__name__}: {e}')
+        return
+    # tells the pool the worker is ready
+    connection.send(None)
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        connection.send(worker.run(*message))
+
+
+class WorkerProcess:
+    """The side of the pool: a started worker process and the connection to it."""
+
+    def __init__(self, context, limits, uid):
+        self.uid = uid
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child_connection, limits, uid), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def wait_until_started(self):
+        """Wait for the worker to be ready, so its start does not count for the wall time of a program."""
+        try:
+            error = self.connection.recv()
+        except EOFError:
+            error = 'the worker exited'
+        if error is not None:
+            self.kill()
+            raise IsolationUnavailable(f'The worker did not start: {error}')
+
+    def run(self, key, code, answers, has_turtle, wall_seconds):
+        """Run a program, returns its ExecutionResult or None if the worker is gone or took too long."""
+        try:
+            self.connection.send((key, code, list(answers), has_turtle))
+            if not self.connection.poll(wall_seconds):
+                return None
+            return self.connection.recv()
+        except (EOFError, OSError):
+            return None
+
+    def stop(self):
+        with contextlib.suppress(OSError):
+            self.connection.send(None)
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class SandboxPool:
+    """A pool of isolated worker processes that run transpiled Hedy programs with resource limits.
+
+    The pool can be used from several threads at once, every program runs in
+    the first worker that is free. isolate=False is only for code we trust.
+    """
+
+    def __init__(self, workers=None, limits=DEFAULT_LIMITS, isolate=True):
+        if isolate and not can_isolate():
+            raise IsolationUnavailable('Isolating the workers needs root on an OS with resource limits and chroot')
+        self.size = workers or os.cpu_count() or 1
+        self.limits = limits
+        self.isolate = isolate
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.Lock()
+        self.workers = []
+        self.idle = queue.Queue()
+        started = [self.start_worker(FIRST_WORKER_UID + i) for i in range(self.size)]
+        try:
+            for worker in started:
+                worker.wait_until_started()
+        except IsolationUnavailable:
+            self.close()
+            raise
+        for worker in started:
+            self.idle.put(worker)
+
+    def start_worker(self, uid):
+        worker = WorkerProcess(self.context, self.limits, uid if self.isolate else None)
+        with self.lock:
+            self.workers.append(worker)
+        return worker
+
+    def replace_worker(self, worker):
+        with self.lock:
+            self.workers.remove(worker)
+        worker.kill()
+        # the new worker gets the user of the old one, so every worker still has a user of its own
+        new_worker = self.start_worker(worker.uid)
+        new_worker.wait_until_started()
+        return new_worker
+
+    def run(self, input_string, level, answers=()):
+        """Transpile and run a Hedy program. HedyExceptions of the transpiler are raised as usual."""
+        python = hedy.transpile(input_string, level)
+        return self.run_python(python.code, answers, python.has_turtle)
+
+    def run_python(self, code, answers=(), has_turtle=False):
+        """Run the Python code of a transpiled program, returns an ExecutionResult."""
+        key = program_hash(code)
+        worker = self.idle.get()
+        try:
+            result = worker.run(key, code, answers, has_turtle, self.limits.wall_seconds)
+            if result is None:
+                alive = worker.process.is_alive()
+                worker = self.replace_worker(worker)
+                result = ExecutionResult('', WALL_TIME_EXCEEDED if alive else WORKER_DIED, None)
+            return result
+        finally:
+            self.idle.put(worker)
+
+    def run_many(self, programs):
+        """Run (code, level, answers) tuples on all workers, returns their ExecutionResults in the same order.
+
+        A program that does not transpile gets its HedyException as its result.
+        """
+        def run(program):
+            try:
+                return self.run(*program)
+            except hedy.HedyException as e:
+                return e
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run, programs))
+
+    def close(self):
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
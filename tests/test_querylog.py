@@ -1,4 +1,5 @@
 from website import querylog, log_queue
+import os
 import unittest
 
 class TestQueryLog(unittest.TestCase):
@@ -36,3 +37,14 @@ class TestQueryLog(unittest.TestCase):
     self.assertEqual(self.records[0]['banaan'], 'geel')
     self.assertEqual(self.records[0]['bloem'], 'rood')
     self.assertEqual(self.records[0]['terminated'], True)
+
+  @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork()')
+  def test_writer_runs_in_forked_process(self):
+    # like the gunicorn workers, when the app is preloaded in the master
+    querylog.LOG_QUEUE.add({'banaan': 'geel'})
+    pid = os.fork()
+    if pid == 0:
+      ok = querylog.LOG_QUEUE.thread.is_alive() and not querylog.LOG_QUEUE.records_queue
+      os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    self.assertEqual(0, os.WEXITSTATUS(status))
@@ -1,3 +1,4 @@
+import os
 import unittest
 import utils
 import bcrypt
@@ -14,4 +15,13 @@ class TestUtils(unittest.TestCase):
 
   def test_extract_default_rounds(self):
     salt = bcrypt.gensalt ().decode ('utf-8')
-    self.assertEqual(12, utils.extract_bcrypt_rounds(salt))
\ No newline at end of file
+    self.assertEqual(12, utils.extract_bcrypt_rounds(salt))
+
+  @unittest.skipUnless(os.path.exists('/proc/self/smaps_rollup'), 'needs /proc/<pid>/smaps_rollup')
+  def test_memory_usage(self):
+    usage = utils.memory_usage()
+    self.assertEqual({'rss', 'shared', 'private', 'pss'}, set(usage))
+    self.assertEqual(usage['rss'], usage['shared'] + usage['private'])
+
+  def test_memory_usage_of_missing_process(self):
+    self.assertIsNone(utils.memory_usage('no-such-process'))
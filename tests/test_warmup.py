@@ -0,0 +1,43 @@
+from website import warmup
+import threading
+import unittest
+
+class TestWarmup(unittest.TestCase):
+  def test_not_started_is_ready(self):
+    w = warmup.Warmup()
+    w.add('task', lambda: None)
+
+    self.assertTrue(w.is_ready())
+    self.assertTrue(w.wait(0))
+
+  def test_runs_tasks_in_background(self):
+    w = warmup.Warmup()
+    release = threading.Event()
+    done = []
+    w.add('first', lambda: done.append('first'))
+    w.add('second', release.wait)
+    w.start()
+
+    self.assertFalse(w.wait(0.1))
+    status = w.status()
+    self.assertEqual(False, status['ready'])
+    self.assertEqual(1, status['done'])
+    self.assertEqual(2, status['total'])
+    self.assertEqual('second', status['current'])
+
+    release.set()
+    self.assertTrue(w.wait(5))
+    self.assertEqual(['first'], done)
+    self.assertEqual(True, w.status()['ready'])
+    self.assertEqual(2, w.status()['done'])
+
+  def test_failing_task_does_not_stop_warmup(self):
+    w = warmup.Warmup()
+    done = []
+    w.add('broken', lambda: 1 / 0)
+    w.add('working', lambda: done.append('working'))
+    w.start().join()
+
+    self.assertEqual(['working'], done)
+    self.assertEqual(['broken'], w.status()['failed'])
+    self.assertTrue(w.is_ready())
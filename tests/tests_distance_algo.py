@@ -57,3 +57,28 @@ class TestsHelperFunctions(unittest.TestCase):
     invalid_command = "hello Ask echo0 print"
     closest = hedy.closest_command(invalid_command, ['ask', 'print', 'echo'])
     self.assertEqual("echo", closest)
+
+  def test_suggested_command_uses_commands_of_level(self):
+    self.assertEqual('print', hedy.suggested_command('prnt', 1))
+    self.assertEqual('for', hedy.suggested_command('fore', 8))
+    self.assertEqual(None, hedy.suggested_command('print', 3))
+
+  def test_candidates_are_the_closest_commands_with_their_distance(self):
+    index = hedy.SuggestionIndex(['print', 'ask', 'is', 'if', 'for'])
+    self.assertEqual([('ask', 2), ('is', 2)], index.candidates('aks'))
+    self.assertEqual([('ask', 2)], index.candidates('aks', k=1))
+    self.assertEqual([], index.candidates('aks', max_distance=1))
+    self.assertEqual([('print', 1)], index.candidates('prnt'))
+
+  def test_closest_of_many_commands(self):
+    # like the keywords of all languages together
+    commands = ['print', 'ask', 'echo', 'afdrukken', 'vraag', 'imprimir', 'preguntar', 'drucke', 'frage']
+    index = hedy.SuggestionIndex(commands)
+    self.assertEqual('vraag', index.suggest('vrag'))
+    self.assertEqual('imprimir', index.suggest('inprimir'))
+    self.assertEqual('ask', index.suggest(''))
+
+  def test_minimum_distance_with_limit(self):
+    self.assertEqual(5, hedy.minimum_distance('print', 'hallo'))
+    self.assertEqual(2, hedy.minimum_distance('print', 'hallo', limit=1))
+    self.assertEqual(2, hedy.minimum_distance('print', 'printechoask', limit=1))
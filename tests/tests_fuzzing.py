@@ -0,0 +1,48 @@
+import os
+import random
+import tempfile
+import unittest
+import fuzzhedy
+
+
+class TestsFuzzing(unittest.TestCase):
+
+  def generate(self, level, count, seed=1, **kwargs):
+    generator = fuzzhedy.ProgramGenerator(level, rng=random.Random(seed), **kwargs)
+    return [generator.generate() for _ in range(count)]
+
+  def test_same_seed_same_programs(self):
+    self.assertEqual(self.generate(8, 5), self.generate(8, 5))
+    self.assertNotEqual(self.generate(8, 5), self.generate(8, 5, seed=2))
+
+  def test_programs_grow_to_about_the_number_of_lines(self):
+    for program in self.generate(3, 20, lines=5):
+      # a program stops growing at 5 lines, and ends the line it is on
+      self.assertLessEqual(program.count('\n'), 6, program)
+
+  def test_blocks_are_at_most_depth_deep(self):
+    for program in self.generate(8, 20, lines=10, depth=1):
+      for line in program.split('\n'):
+        indentation = len(line) - len(line.lstrip(' '))
+        self.assertLessEqual(indentation, 4, program)
+
+  def test_blocks_have_no_end_block_lines(self):
+    programs = self.generate(17, 20, lines=10, depth=2)
+    self.assertTrue(any(line.startswith('        ') for program in programs for line in program.split('\n')))
+    self.assertFalse(any('end-block' in program or '_END_BLOCK_' in program for program in programs))
+
+  def test_many_programs_are_valid(self):
+    results = [fuzzhedy.time_transpile(program, 12) for program in self.generate(12, 20, lines=5, depth=2)]
+    valid = [r for r in results if r.error is None]
+    self.assertGreaterEqual(len(valid), 5)
+
+  def test_corpus_is_in_batchhedy_format(self):
+    result = fuzzhedy.FuzzResult(7, "repeat 3 times\n    print 'hallo'", 0.25, None)
+    with tempfile.TemporaryDirectory() as directory:
+      fuzzhedy.write_corpus([result], directory, seed=3)
+      with open(os.path.join(directory, 'fuzz-level07-001.hedy'), encoding='utf-8') as f:
+        lines = f.readlines()
+
+    # batchhedy takes the level from the first line and the code from the fifth line on
+    self.assertEqual(7, int(lines[0].split('=')[-1]))
+    self.assertEqual(result.code + '\n', ''.join(lines[4:]))
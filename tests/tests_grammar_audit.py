@@ -0,0 +1,44 @@
+import unittest
+import auditgrammars
+from lark.parsers import earley
+
+
+class TestsGrammarAudit(unittest.TestCase):
+
+  def test_reports_ambiguous_commands(self):
+    audit = auditgrammars.audit_level(1, ['print hallo', 'forward 50'])
+
+    self.assertEqual(2, audit.programs)
+    self.assertEqual(2, audit.ambiguous_programs)
+    self.assertEqual(1, audit.ambiguities['command: invalid | print'])
+    self.assertEqual('print hallo', audit.examples['command: invalid | print'])
+
+  def test_reports_unused_rules(self):
+    audit = auditgrammars.audit_level(1, ['print hallo'])
+
+    self.assertIn('echo', audit.unused)
+    self.assertNotIn('print', audit.unused)
+
+  def test_reports_overlapping_terminals(self):
+    audit = auditgrammars.audit_level(1, ['print hallo'])
+
+    # the keyword print is also a text without spaces
+    self.assertEqual('print', audit.overlaps['textwithoutspaces']['_PRINT'])
+    self.assertEqual('print', audit.overlaps['_PRINT']['textwithoutspaces'])
+
+  def test_counts_items_of_invalid_programs(self):
+    audit = auditgrammars.audit_level(5, ['x is ,,,'])
+
+    self.assertEqual(1, audit.errors)
+    self.assertGreater(audit.items['assign'], 0)
+
+  def test_reports_lalr_conflicts(self):
+    # all levels run on Earley, the conflicts are worked out from the grammar anyway
+    self.assertEqual([], auditgrammars.audit_level(1, ['print hallo']).lalr_conflicts)
+    self.assertIn('ask', auditgrammars.audit_level(2, ['print hallo']).lalr_conflicts)
+
+  def test_counting_items_restores_the_parser(self):
+    original = earley.Item
+    with auditgrammars.counting_items({}):
+      self.assertIsNot(original, earley.Item)
+    self.assertIs(original, earley.Item)
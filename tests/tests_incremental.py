@@ -0,0 +1,57 @@
+import unittest
+import textwrap
+import hedy
+
+
+class TestsIncrementalTranspile(unittest.TestCase):
+
+  def test_only_changed_lines_are_parsed(self):
+    transpiler = hedy.IncrementalTranspiler(3)
+    code = textwrap.dedent("""\
+    naam is Hedy
+    print 'hallo' naam
+    print 'doei'""")
+    result = transpiler.transpile(code)
+    self.assertEqual(hedy.transpile(code, 3), result)
+    self.assertEqual(3, transpiler.chunks_parsed)
+
+    edited = code.replace("'doei'", "'tot ziens' naam")
+    result = transpiler.transpile(edited)
+    self.assertEqual(hedy.transpile(edited, 3), result)
+    self.assertEqual(4, transpiler.chunks_parsed)
+
+  def test_variables_from_unchanged_lines_are_known(self):
+    transpiler = hedy.IncrementalTranspiler(2)
+    transpiler.transpile("naam is Hedy\nprint hallo")
+    result = transpiler.transpile("naam is Hedy\nprint hallo naam")
+    self.assertEqual("naam = 'Hedy'\nprint(f'hallo {naam}')", result.code)
+
+  def test_else_stays_with_its_if(self):
+    code = "a is 2\nif a is 1 print a\nelse print 'nee'"
+    self.assertEqual(['a is 2', "if a is 1 print a\nelse print 'nee'"], hedy.split_into_chunks(code, 4))
+    self.assertEqual(hedy.transpile(code, 4), hedy.IncrementalTranspiler(4).transpile(code))
+
+  def test_blocks_are_chunks(self):
+    code = textwrap.dedent("""\
+    naam is Hedy
+    if naam is Hedy
+        print 'leuk'
+    else
+        print 'jammer'
+    print 'klaar'""")
+    preprocessed, level = hedy.prepare_program(code, 7)
+    chunks = hedy.split_into_chunks(preprocessed, level)
+    self.assertEqual(3, len(chunks))
+    self.assertTrue(chunks[1].startswith('if naam is Hedy'))
+
+    transpiler = hedy.IncrementalTranspiler(7)
+    self.assertEqual(hedy.transpile(code, 7), transpiler.transpile(code))
+    edited = code.replace("'klaar'", "'einde'")
+    self.assertEqual(hedy.transpile(edited, 7), transpiler.transpile(edited))
+    self.assertEqual(4, transpiler.chunks_parsed)
+
+  def test_errors_are_the_same_as_transpile(self):
+    code = "print 'hallo'\nprnt 'doei'"
+    with self.assertRaises(hedy.InvalidCommandException) as context:
+      hedy.IncrementalTranspiler(3).transpile(code)
+    self.assertEqual('prnt', context.exception.arguments['invalid_command'])
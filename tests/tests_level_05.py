@@ -58,7 +58,7 @@ class TestsLevel5(unittest.TestCase):
     code = "nummer is 4 + 5"
     result = hedy.transpile(code, self.level)
 
-    expected = "nummer = int(4) + int(5)"
+    expected = "nummer = 4 + 5"
     self.assertEqual(expected, result.code)
     self.assertEqual(False, result.has_turtle)
 
@@ -71,7 +71,7 @@ class TestsLevel5(unittest.TestCase):
 
     expected = textwrap.dedent("""\
     var = '5'
-    print(str(int(var) + int(5)))""")
+    print(str(int(var) + 5))""")
 
     self.assertEqual(expected, result.code)
 
@@ -79,7 +79,7 @@ class TestsLevel5(unittest.TestCase):
     code = "nummer is 4+5"
     result = hedy.transpile(code, self.level)
 
-    expected = "nummer = int(4) + int(5)"
+    expected = "nummer = 4 + 5"
     self.assertEqual(expected, result.code)
     self.assertEqual(False, result.has_turtle)
 
@@ -105,7 +105,7 @@ class TestsLevel5(unittest.TestCase):
     print '5 keer 5 is ' 5 * 5""")
 
     expected = textwrap.dedent("""\
-    print('5 keer 5 is '+str(int(5) * int(5)))""")
+    print('5 keer 5 is '+str(5 * 5))""")
 
     result = hedy.transpile(code, self.level)
 
@@ -117,7 +117,7 @@ class TestsLevel5(unittest.TestCase):
     print '5 keer 5 keer 5 is ' 5 * 5 * 5""")
 
     expected = textwrap.dedent("""\
-    print('5 keer 5 keer 5 is '+str(int(5) * int(5) * int(5)))""")
+    print('5 keer 5 keer 5 is '+str(5 * 5 * 5))""")
 
     result = hedy.transpile(code, self.level)
     self.assertEqual(expected, result.code)
@@ -165,7 +165,7 @@ class TestsLevel5(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    nummer = int(4) + int(5)
+    nummer = 4 + 5
     print(str(nummer))""")
 
     self.assertEqual(expected, result.code)
@@ -245,7 +245,7 @@ class TestsLevel5(unittest.TestCase):
           print('ok dan wordt het '+str(prijs)+' euro')
         print(str(toet))
         if str(toet) == str('ijsje'):
-          prijs = int(prijs) + int(2)
+          prijs = int(prijs) + 2
         print('ok bedankt dan wordt het '+str(prijs)+' euro')""")
 
       self.assertEqual(expected, result.code)
@@ -267,7 +267,7 @@ class TestsLevel5(unittest.TestCase):
       punten = '0'
       worp=random.choice(keuzes)
       if str(worp) == str('regenworm'):
-        punten = int(punten) + int(5)
+        punten = int(punten) + 5
       else:
         punten = int(punten) + int(worp)
       print('dat zijn dan '+str(punten))""")
@@ -132,7 +132,7 @@ class TestsLevel6(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    for i in range(int('3')):
+    for i in range(3):
       t.forward(100)
       time.sleep(0.1)""")
 
@@ -148,8 +148,8 @@ class TestsLevel6(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    n = '5'
-    for i in range(int(n)):
+    n = 5
+    for i in range(n):
       print('me wants a cookie!')""")
 
     self.assertEqual(expected, result.code)
@@ -164,6 +164,39 @@ class TestsLevel6(unittest.TestCase):
 
     self.assertEqual(expected_output, run_code(result))
 
+  def test_number_with_leading_zero_stays_text(self):
+    code = textwrap.dedent("""\
+    a is 007
+    repeat a times print a""")
+
+    result = hedy.transpile(code, self.level)
+
+    expected = textwrap.dedent("""\
+    a = '007'
+    for i in range(int(a)):
+      print(str(a))""")
+
+    self.assertEqual(expected, result.code)
+    self.assertEqual('\n'.join(['007'] * 7), run_code(result))
+
+  def test_number_with_leading_zero_in_calculation(self):
+    code = textwrap.dedent("""\
+    a is 05
+    print a
+    b is a + 1
+    print b""")
+
+    result = hedy.transpile(code, self.level)
+
+    expected = textwrap.dedent("""\
+    a = '05'
+    print(str(a))
+    b = int(a) + 1
+    print(str(b))""")
+
+    self.assertEqual(expected, result.code)
+    self.assertEqual('05\n6', run_code(result))
+
   def test_transpile_other(self):
     with self.assertRaises(hedy.InvalidCommandException) as context:
       result = hedy.transpile("abc felienne 123", self.level)
@@ -180,7 +213,7 @@ class TestsLevel6(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    for i in range(int('5')):
+    for i in range(5):
       print('me wants a cookie!')""")
 
     self.assertEqual(expected, result.code)
@@ -204,7 +237,7 @@ class TestsLevel6(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    for i in range(int('10')):
+    for i in range(10):
       print('me wants a cookie!')""")
 
     self.assertEqual(expected, result.code)
@@ -234,7 +267,7 @@ class TestsLevel6(unittest.TestCase):
 
       expected = textwrap.dedent("""\
       i = 'hallo!'
-      for _i in range(int('5')):
+      for _i in range(5):
         print('me wants a cookie!')
       print(str(i))""")
 
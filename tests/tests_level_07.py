@@ -82,7 +82,7 @@ class TestsLevel7(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    print('5 keer 5 is '+str(int(5) * int(5)))""")
+    print('5 keer 5 is '+str(5 * 5))""")
 
     self.assertEqual(expected, result.code)
 
@@ -95,9 +95,9 @@ class TestsLevel7(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    nummer = '5'
-    nummertwee = '6'
-    print(str(int(nummer) * int(nummertwee)))""")
+    nummer = 5
+    nummertwee = 6
+    print(str(nummer * nummertwee))""")
 
     self.assertEqual(expected, result.code)
 
@@ -137,7 +137,7 @@ class TestsLevel7(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    for i in range(int(5)):
+    for i in range(5):
       print('koekoek')""")
 
     self.assertEqual(expected, result.code)
@@ -153,8 +153,8 @@ class TestsLevel7(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    n = '5'
-    for i in range(int(n)):
+    n = 5
+    for i in range(n):
       print('me wants a cookie!')""")
 
     self.assertEqual(expected, result.code)
@@ -177,8 +177,8 @@ class TestsLevel7(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    v79de0191e90551f058d466c5e8c267ff = '5'
-    for i in range(int(v79de0191e90551f058d466c5e8c267ff)):
+    v79de0191e90551f058d466c5e8c267ff = 5
+    for i in range(v79de0191e90551f058d466c5e8c267ff):
       print('me wants a cookie!')""")
 
     self.assertEqual(expected, result.code)
@@ -204,7 +204,7 @@ class TestsLevel7(unittest.TestCase):
     expected = textwrap.dedent("""\
     kleur = 'groen'
     if str(kleur) == str('groen'):
-      for i in range(int(3)):
+      for i in range(3):
         print('mooi')""")
 
     self.assertEqual(expected, result.code)
@@ -240,7 +240,7 @@ class TestsLevel7(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    for i in range(int(5)):
+    for i in range(5):
       print('me wants a cookie!')""")
 
     self.assertEqual(expected, result.code)
@@ -299,8 +299,8 @@ class TestsLevel7(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    var = '5'
-    print(str(int(var) + int(5)))""")
+    var = 5
+    print(str(var + 5))""")
 
     self.assertEqual(expected, result.code)
 
@@ -314,10 +314,10 @@ class TestsLevel7(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    count = '1'
-    for i in range(int(12)):
-      print(str(count)+' times 12 is '+str(int(count) * int(12)))
-      count = int(count) + int(1)""")
+    count = 1
+    for i in range(12):
+      print(str(count)+' times 12 is '+str(count * 12))
+      count = count + 1""")
 
     self.assertEqual(expected, result.code)
 
@@ -349,7 +349,7 @@ class TestsLevel7(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    for i in range(int(5)):
+    for i in range(5):
       if str('antwoord2') == str('10'):
         print('Goedzo')
       else:
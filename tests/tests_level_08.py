@@ -39,7 +39,7 @@ class TestsLevel8(unittest.TestCase):
 
   def test_print_with_calc_no_spaces(self):
     result = hedy.transpile("print '5 keer 5 is ' 5*5", self.level)
-    expected = "print('5 keer 5 is '+str(int(5) * int(5)))"
+    expected = "print('5 keer 5 is '+str(5 * 5))"
     self.assertEqual(expected, result.code)
     self.assertEqual(False, result.has_turtle)
 
@@ -52,9 +52,9 @@ class TestsLevel8(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    nummer = '5'
-    nummertwee = '6'
-    print(str(int(nummer) * int(nummertwee)))""")
+    nummer = 5
+    nummertwee = 6
+    print(str(nummer * nummertwee))""")
 
     self.assertEqual(expected, result.code)
     self.assertEqual(False, result.has_turtle)
@@ -127,12 +127,12 @@ class TestsLevel8(unittest.TestCase):
       a is a + 2
       b is b + 2""")
     expected = textwrap.dedent("""\
-    a = '2'
-    a = '3'
-    step = 1 if int(2) < int(4) else -1
-    for a in range(int(2), int(4) + step, step):
-      a = int(a) + int(2)
-      b = int(b) + int(2)""")
+    a = 2
+    a = 3
+    step = 1 if 2 < 4 else -1
+    for a in range(2, 4 + step, step):
+      a = a + 2
+      b = b + 2""")
 
     result = hedy.transpile(code, self.level)
 
@@ -164,8 +164,8 @@ class TestsLevel8(unittest.TestCase):
       print i
     print 'wie niet weg is is gezien'""")
     expected = textwrap.dedent("""\
-    step = 1 if int(1) < int(10) else -1
-    for i in range(int(1), int(10) + step, step):
+    step = 1 if 1 < 10 else -1
+    for i in range(1, 10 + step, step):
       print(str(i))
     print('wie niet weg is is gezien')""")
 
@@ -181,8 +181,8 @@ class TestsLevel8(unittest.TestCase):
       print i
     print 'wie niet weg is is gezien'""")
     expected = textwrap.dedent("""\
-    step = 1 if int(10) < int(1) else -1
-    for i in range(int(10), int(1) + step, step):
+    step = 1 if 10 < 1 else -1
+    for i in range(10, 1 + step, step):
       print(str(i))
     print('wie niet weg is is gezien')""")
 
@@ -204,8 +204,8 @@ class TestsLevel8(unittest.TestCase):
         i is 10""")
 
     expected = textwrap.dedent("""\
-    step = 1 if int(0) < int(10) else -1
-    for i in range(int(0), int(10) + step, step):
+    step = 1 if 0 < 10 else -1
+    for i in range(0, 10 + step, step):
       antwoord = input('Wat is 5*5')
       if str(antwoord) == str('24'):
         print('Dat is fout!')
@@ -230,8 +230,8 @@ class TestsLevel8(unittest.TestCase):
     print 'klaar met for loop'""")
 
     expected = textwrap.dedent("""\
-      step = 1 if int(0) < int(10) else -1
-      for i in range(int(0), int(10) + step, step):
+      step = 1 if 0 < 10 else -1
+      for i in range(0, 10 + step, step):
         antwoord = input('Wat is 5*5')
         if str(antwoord) == str('24'):
           print('fout')
@@ -249,8 +249,8 @@ class TestsLevel8(unittest.TestCase):
         print '2'""")
 
     expected = textwrap.dedent("""\
-      step = 1 if int(0) < int(10) else -1
-      for i in range(int(0), int(10) + step, step):
+      step = 1 if 0 < 10 else -1
+      for i in range(0, 10 + step, step):
         if str(i) == str('2'):
           print('2')""")
 
@@ -259,6 +259,20 @@ class TestsLevel8(unittest.TestCase):
     self.assertEqual(expected, result.code)
     self.assertEqual(False, result.has_turtle)
 
+  def test_parse_error_line_after_block(self):
+    # the end of the block is not a line in the program, so it is not counted
+    code = textwrap.dedent("""\
+    for i in range 1 to 3
+        print i
+    print 'a'
+    print 'b'
+    repeat 3 times
+        print 'c'""")
+
+    with self.assertRaises(hedy.ParseException) as context:
+      result = hedy.transpile(code, self.level)
+    self.assertEqual((6, 1), context.exception.location)
+
 
 #programs with issues to see if we catch them properly
 # (so this should fail, for now)
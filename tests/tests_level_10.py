@@ -39,7 +39,7 @@ class TestsLevel10(unittest.TestCase):
 
   def test_print_with_calc_no_spaces(self):
     result = hedy.transpile("print '5 keer 5 is ' 5*5", self.level)
-    expected = "print('5 keer 5 is '+str(int(5) * int(5)))"
+    expected = "print('5 keer 5 is '+str(5 * 5))"
     self.assertEqual(expected, result.code)
     self.assertEqual(False, result.has_turtle)
 
@@ -52,9 +52,9 @@ class TestsLevel10(unittest.TestCase):
     result = hedy.transpile(code, self.level)
 
     expected = textwrap.dedent("""\
-    nummer = '5'
-    nummertwee = '6'
-    print(str(int(nummer) * int(nummertwee)))""")
+    nummer = 5
+    nummertwee = 6
+    print(str(nummer * nummertwee))""")
 
     self.assertEqual(expected, result.code)
     self.assertEqual(False, result.has_turtle)
@@ -129,12 +129,12 @@ class TestsLevel10(unittest.TestCase):
       a is a + 2
       b is b + 2""")
     expected = textwrap.dedent("""\
-    a = '2'
-    a = '3'
-    step = 1 if int(2) < int(4) else -1
-    for a in range(int(2), int(4) + step, step):
-      a = int(a) + int(2)
-      b = int(b) + int(2)""")
+    a = 2
+    a = 3
+    step = 1 if 2 < 4 else -1
+    for a in range(2, 4 + step, step):
+      a = a + 2
+      b = b + 2""")
 
     result = hedy.transpile(code, self.level)
 
@@ -168,8 +168,8 @@ class TestsLevel10(unittest.TestCase):
       print i
     print 'wie niet weg is is gezien'""")
     expected = textwrap.dedent("""\
-    step = 1 if int(1) < int(10) else -1
-    for i in range(int(1), int(10) + step, step):
+    step = 1 if 1 < 10 else -1
+    for i in range(1, 10 + step, step):
       print(str(i))
     print('wie niet weg is is gezien')""")
     result = hedy.transpile(code, self.level)
@@ -183,10 +183,10 @@ class TestsLevel10(unittest.TestCase):
       for j in range 1 to 4:
         print 'rondje: ' i ' tel: ' j""")
     expected = textwrap.dedent("""\
-    step = 1 if int(1) < int(3) else -1
-    for i in range(int(1), int(3) + step, step):
-      step = 1 if int(1) < int(4) else -1
-      for j in range(int(1), int(4) + step, step):
+    step = 1 if 1 < 3 else -1
+    for i in range(1, 3 + step, step):
+      step = 1 if 1 < 4 else -1
+      for j in range(1, 4 + step, step):
         print('rondje: '+str(i)+' tel: '+str(j))""")
 
     result = hedy.transpile(code, self.level)
@@ -225,8 +225,8 @@ class TestsLevel10(unittest.TestCase):
         i is 10""")
 
     expected = textwrap.dedent("""\
-    step = 1 if int(0) < int(10) else -1
-    for i in range(int(0), int(10) + step, step):
+    step = 1 if 0 < 10 else -1
+    for i in range(0, 10 + step, step):
       antwoord = input('Wat is 5*5')
       if str(antwoord) == str('24'):
         print('Dat is fout!')
@@ -42,7 +42,7 @@ class TestsLevel17(unittest.TestCase):
 
     def test_print_with_calc_no_spaces(self):
         result = hedy.transpile("print('5 keer 5 is ' 5*5)", self.level)
-        expected = "print('5 keer 5 is '+str(int(5) * int(5)))"
+        expected = "print('5 keer 5 is '+str(5 * 5))"
         self.assertEqual(expected, result.code)
         self.assertEqual(False, result.has_turtle)
 
@@ -61,9 +61,9 @@ class TestsLevel17(unittest.TestCase):
         result = hedy.transpile(code, self.level)
 
         expected = textwrap.dedent("""\
-    nummer = '5'
-    nummertwee = '6'
-    print(str(int(nummer) * int(nummertwee)))""")
+    nummer = 5
+    nummertwee = 6
+    print(str(nummer * nummertwee))""")
 
         self.assertEqual(expected, result.code)
         self.assertEqual(False, result.has_turtle)
@@ -129,12 +129,12 @@ else:
       a is a + 2
       b is b + 2""")
         expected = textwrap.dedent("""\
-    a = '2'
-    a = '3'
-    step = 1 if int(2) < int(4) else -1
-    for a in range(int(2), int(4) + step, step):
-      a = int(a) + int(2)
-      b = int(b) + int(2)""")
+    a = 2
+    a = 3
+    step = 1 if 2 < 4 else -1
+    for a in range(2, 4 + step, step):
+      a = a + 2
+      b = b + 2""")
 
         result = hedy.transpile(code, self.level)
         self.assertEqual(expected, result.code)
@@ -164,8 +164,8 @@ else:
       print(i)
     print('wie niet weg is is gezien')""")
         expected = textwrap.dedent("""\
-    step = 1 if int(1) < int(10) else -1
-    for i in range(int(1), int(10) + step, step):
+    step = 1 if 1 < 10 else -1
+    for i in range(1, 10 + step, step):
       print(str(i))
     print('wie niet weg is is gezien')""")
 
@@ -179,10 +179,10 @@ else:
       for j in range(1,4):
         print('rondje: ' i ' tel: ' j)""")
         expected = textwrap.dedent("""\
-    step = 1 if int(1) < int(3) else -1
-    for i in range(int(1), int(3) + step, step):
-      step = 1 if int(1) < int(4) else -1
-      for j in range(int(1), int(4) + step, step):
+    step = 1 if 1 < 3 else -1
+    for i in range(1, 3 + step, step):
+      step = 1 if 1 < 4 else -1
+      for j in range(1, 4 + step, step):
         print('rondje: '+str(i)+' tel: '+str(j))""")
 
         result = hedy.transpile(code, self.level)
@@ -216,8 +216,8 @@ else:
         expected = textwrap.dedent("""\
     leeftijd = input('Hoe oud ben jij?')
     print('Dus jij hebt zo veel verjaardagen gehad:')
-    step = 1 if int(0) < int(leeftijd) else -1
-    for i in range(int(0), int(leeftijd) + step, step):
+    step = 1 if 0 < int(leeftijd) else -1
+    for i in range(0, int(leeftijd) + step, step):
       print(str(i))""")
 
         result = hedy.transpile(code, self.level)
@@ -279,8 +279,8 @@ else:
     score = ['100', '300', '500']
     highscore=random.choice(score)
     print('De highscore is: '+str(highscore))
-    step = 1 if int(1) < int(3) else -1
-    for i in range(int(1), int(3) + step, step):
+    step = 1 if 1 < 3 else -1
+    for i in range(1, 3 + step, step):
       scorenu=score[i-1]
       print('Score is nu '+str(scorenu))
       if str(highscore) == str('score[i]'):
@@ -302,8 +302,8 @@ else:
         i is 10""")
 
         expected = textwrap.dedent("""\
-    step = 1 if int(0) < int(10) else -1
-    for i in range(int(0), int(10) + step, step):
+    step = 1 if 0 < 10 else -1
+    for i in range(0, 10 + step, step):
       antwoord = input('Wat is 5*5')
       if str(antwoord) == str('24'):
         print('Dat is fout!')
@@ -467,7 +467,7 @@ else:
         print('Dan ben je jonger dan ik!')""")
         expected = textwrap.dedent("""\
     leeftijd = input('Hoe oud ben jij?')
-    if int(leeftijd) < int('12'):
+    if int(leeftijd) < 12:
       print('Dan ben je jonger dan ik!')""")
 
         result = hedy.transpile(code, self.level)
@@ -481,7 +481,7 @@ else:
         print('Dan ben je ouder dan ik!')""")
         expected = textwrap.dedent("""\
     leeftijd = input('Hoe oud ben jij?')
-    if int(leeftijd) > int('12'):
+    if int(leeftijd) > 12:
       print('Dan ben je ouder dan ik!')""")
 
         result = hedy.transpile(code, self.level)
@@ -497,9 +497,9 @@ else:
         print('Dan ben je ouder dan ik!')""")
         expected = textwrap.dedent("""\
     leeftijd = input('Hoe oud ben jij?')
-    if int(leeftijd) < int('12'):
+    if int(leeftijd) < 12:
       print('Dan ben je jonger dan ik!')
-    elif int(leeftijd) > int('12'):
+    elif int(leeftijd) > 12:
       print('Dan ben je ouder dan ik!')""")
 
         result = hedy.transpile(code, self.level)
@@ -533,11 +533,11 @@ else:
         tel is tel + 1
     print('We zijn klaar')""")
         expected = textwrap.dedent("""\
-    tel = '1'
+    tel = 1
     # [' we gaan door totdat tel 3 is!']
-    while int(tel) < int('3'):
+    while tel < 3:
       print('Dit is de '+str(tel)+'e keer')
-      tel = int(tel) + int(1)
+      tel = tel + 1
     print('We zijn klaar')""")
 
         result = hedy.transpile(code, self.level)
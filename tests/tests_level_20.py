@@ -45,7 +45,7 @@ class TestsLevel20(unittest.TestCase):
 
     def test_print_with_calc_no_spaces(self):
         result = hedy.transpile("print('5 keer 5 is ' 5*5)", self.level)
-        expected = "print('5 keer 5 is '+str(int(5) * int(5)))"
+        expected = "print('5 keer 5 is '+str(5 * 5))"
         self.assertEqual(expected, result.code)
         self.assertEqual(False, result.has_turtle)
 
@@ -64,9 +64,9 @@ class TestsLevel20(unittest.TestCase):
         result = hedy.transpile(code, self.level)
 
         expected = textwrap.dedent("""\
-    nummer = '5'
-    nummertwee = '6'
-    print(str(int(nummer) * int(nummertwee)))""")
+    nummer = 5
+    nummertwee = 6
+    print(str(nummer * nummertwee))""")
 
         self.assertEqual(expected, result.code)
         self.assertEqual(False, result.has_turtle)
@@ -172,12 +172,12 @@ else:
       a = a + 2
       b = b + 2""")
         expected = textwrap.dedent("""\
-    a = '2'
-    a = '3'
-    step = 1 if int(2) < int(4) else -1
-    for a in range(int(2), int(4) + step, step):
-      a = int(a) + int(2)
-      b = int(b) + int(2)""")
+    a = 2
+    a = 3
+    step = 1 if 2 < 4 else -1
+    for a in range(2, 4 + step, step):
+      a = a + 2
+      b = b + 2""")
 
         result = hedy.transpile(code, self.level)
         self.assertEqual(expected, result.code)
@@ -207,8 +207,8 @@ else:
       print(i)
     print('wie niet weg is is gezien')""")
         expected = textwrap.dedent("""\
-    step = 1 if int(1) < int(10) else -1
-    for i in range(int(1), int(10) + step, step):
+    step = 1 if 1 < 10 else -1
+    for i in range(1, 10 + step, step):
       print(str(i))
     print('wie niet weg is is gezien')""")
 
@@ -222,10 +222,10 @@ else:
       for j in range(1,4):
         print('rondje: ' i ' tel: ' j)""")
         expected = textwrap.dedent("""\
-    step = 1 if int(1) < int(3) else -1
-    for i in range(int(1), int(3) + step, step):
-      step = 1 if int(1) < int(4) else -1
-      for j in range(int(1), int(4) + step, step):
+    step = 1 if 1 < 3 else -1
+    for i in range(1, 3 + step, step):
+      step = 1 if 1 < 4 else -1
+      for j in range(1, 4 + step, step):
         print('rondje: '+str(i)+' tel: '+str(j))""")
 
         result = hedy.transpile(code, self.level)
@@ -259,8 +259,8 @@ else:
         expected = textwrap.dedent("""\
     leeftijd = input('Hoe oud ben jij?')
     print('Dus jij hebt zo veel verjaardagen gehad:')
-    step = 1 if int(0) < int(leeftijd) else -1
-    for i in range(int(0), int(leeftijd) + step, step):
+    step = 1 if 0 < int(leeftijd) else -1
+    for i in range(0, int(leeftijd) + step, step):
       print(str(i))""")
 
         result = hedy.transpile(code, self.level)
@@ -322,8 +322,8 @@ else:
     score = ['100', '300', '500']
     highscore=random.choice(score)
     print('De highscore is: '+str(highscore))
-    step = 1 if int(1) < int(3) else -1
-    for i in range(int(1), int(3) + step, step):
+    step = 1 if 1 < 3 else -1
+    for i in range(1, 3 + step, step):
       scorenu=score[i-1]
       print('Score is nu '+str(scorenu))
       if str(highscore) == str('score[i]'):
@@ -345,8 +345,8 @@ else:
         i = 10""")
 
         expected = textwrap.dedent("""\
-    step = 1 if int(0) < int(10) else -1
-    for i in range(int(0), int(10) + step, step):
+    step = 1 if 0 < 10 else -1
+    for i in range(0, 10 + step, step):
       antwoord = input('Wat is 5*5')
       if str(antwoord) == str('24'):
         print('Dat is fout!')
@@ -510,7 +510,7 @@ else:
         print('Dan ben je jonger dan ik!')""")
         expected = textwrap.dedent("""\
     leeftijd = input('Hoe oud ben jij?')
-    if int(leeftijd) < int('12'):
+    if int(leeftijd) < 12:
       print('Dan ben je jonger dan ik!')""")
 
         result = hedy.transpile(code, self.level)
@@ -524,7 +524,7 @@ else:
         print('Dan ben je ouder dan ik!')""")
         expected = textwrap.dedent("""\
     leeftijd = input('Hoe oud ben jij?')
-    if int(leeftijd) > int('12'):
+    if int(leeftijd) > 12:
       print('Dan ben je ouder dan ik!')""")
 
         result = hedy.transpile(code, self.level)
@@ -540,9 +540,9 @@ else:
         print('Dan ben je ouder dan ik!')""")
         expected = textwrap.dedent("""\
     leeftijd = input('Hoe oud ben jij?')
-    if int(leeftijd) < int('12'):
+    if int(leeftijd) < 12:
       print('Dan ben je jonger dan ik!')
-    elif int(leeftijd) > int('12'):
+    elif int(leeftijd) > 12:
       print('Dan ben je ouder dan ik!')""")
 
         result = hedy.transpile(code, self.level)
@@ -576,11 +576,11 @@ else:
         tel = tel + 1
     print('We zijn klaar')""")
         expected = textwrap.dedent("""\
-    tel = '1'
+    tel = 1
     # [' we gaan door totdat tel 3 is!']
-    while int(tel) < int('3'):
+    while tel < 3:
       print('Dit is de '+str(tel)+'e keer')
-      tel = int(tel) + int(1)
+      tel = tel + 1
     print('We zijn klaar')""")
 
         result = hedy.transpile(code, self.level)
@@ -619,7 +619,7 @@ else:
         expected = textwrap.dedent("""\
     lijst = ['1', '2', '3']
     optellen = int(lijst[1-1]) + int(lijst[2-1])
-    optellen = int(optellen) + int(lijst[3-1])
+    optellen = optellen + int(lijst[3-1])
     # [' we verwachten hier 6']
     print(str(optellen))""")
 
@@ -647,8 +647,8 @@ else:
         print(fruit[i])""")
         expected = textwrap.dedent("""\
     fruit = ['appel', 'banaan', 'kers']
-    step = 1 if int(1) < int(len(fruit)) else -1
-    for i in range(int(1), int(len(fruit)) + step, step):
+    step = 1 if 1 < int(len(fruit)) else -1
+    for i in range(1, int(len(fruit)) + step, step):
       print(str(fruit[i-1]))""")
 
         result = hedy.transpile(code, self.level)
@@ -664,14 +664,56 @@ else:
         expected = textwrap.dedent("""\
     fruit = ['appel', 'banaan', 'kers']
     print('lengte van de lijst is'+str(len(fruit)))
-    step = 1 if int(1) < int(3) else -1
-    for i in range(int(1), int(3) + step, step):
+    step = 1 if 1 < 3 else -1
+    for i in range(1, 3 + step, step):
       print(str(fruit[i-1]))""")
 
         result = hedy.transpile(code, self.level)
         self.assertEqual(expected, result.code)
         self.assertEqual(False, result.has_turtle)
 
+    def test_equality_with_leading_zero(self):
+        code = textwrap.dedent("""\
+    a = 05
+    b = a + 1
+    if a == 5:
+        print('gelijk')
+    else:
+        print('niet gelijk')""")
+        expected = textwrap.dedent("""\
+    a = '05'
+    b = int(a) + 1
+    if str(a) == str('5'):
+      print('gelijk')
+    else:
+      print('niet gelijk')""")
+
+        result = hedy.transpile(code, self.level)
+        self.assertEqual(expected, result.code)
+        self.assertEqual('niet gelijk', run_code(result))
+
+    def test_equality_of_number_and_number_with_leading_zero(self):
+        code = textwrap.dedent("""\
+    a = 5
+    b = 05
+    c = a + b
+    if a == b:
+        print('gelijk')
+    else:
+        print('niet gelijk')""")
+        expected = textwrap.dedent("""\
+    a = 5
+    b = '05'
+    c = a + int(b)
+    if str(a) == str(b):
+      print('gelijk')
+    else:
+      print('niet gelijk')""")
+
+        result = hedy.transpile(code, self.level)
+        self.assertEqual(expected, result.code)
+        self.assertEqual('niet gelijk', run_code(result))
+
     def test_sum_in_if(self):
         code = textwrap.dedent("""\
     if 5+3 == 8:
@@ -679,7 +721,7 @@ else:
     else:
         print('Dit wordt niet geprint want 5+3 is 8!')""")
         expected = textwrap.dedent("""\
-    if int(5) + int(3) == int(8):
+    if 5 + 3 == 8:
       print('5+3 is inderdaad 8')
     else:
       print('Dit wordt niet geprint want 5+3 is 8!')""")
@@ -695,7 +737,7 @@ else:
     else:
         print('Dit wordt niet geprint want 5+3 is 8!')""")
         expected = textwrap.dedent("""\
-    if int(8) == int(5) + int(3):
+    if 8 == 5 + 3:
       print('5+3 is inderdaad 8')
     else:
       print('Dit wordt niet geprint want 5+3 is 8!')""")
@@ -711,7 +753,7 @@ else:
     else:
         print('Dit wordt niet geprint want 5+3 is 8!')""")
         expected = textwrap.dedent("""\
-    if int(5) - int(3) == int(2):
+    if 5 - 3 == 2:
       print('5-3 is inderdaad 2')
     else:
       print('Dit wordt niet geprint want 5+3 is 8!')""")
@@ -727,7 +769,7 @@ else:
     else:
         print('Dit wordt niet geprint want 5+3 is 8!')""")
         expected = textwrap.dedent("""\
-    if int(5) * int(3) == int(15):
+    if 5 * 3 == 15:
       print('5*3 is inderdaad 15')
     else:
       print('Dit wordt niet geprint want 5+3 is 8!')""")
@@ -0,0 +1,55 @@
+import unittest
+import hedy
+
+
+class TestsLevelDetection(unittest.TestCase):
+
+  def test_command_starts_follow_the_grammar(self):
+    self.assertIn('echo', hedy.get_command_starts(1).keywords)
+    self.assertNotIn('for', hedy.get_command_starts(7).keywords)
+    self.assertIn('for', hedy.get_command_starts(8).keywords)
+    self.assertEqual({'is'}, hedy.get_command_starts(4).assign_words)
+    self.assertEqual({'='}, hedy.get_command_starts(20).assign_words)
+
+  def test_possible_levels_skips_levels_without_keyword(self):
+    code = "for i in range 1 to 3\n    print i"
+    self.assertEqual(list(range(8, hedy.HEDY_MAX_LEVEL + 1)), hedy.possible_levels(code))
+
+  def test_possible_levels_keeps_keyword_used_as_variable(self):
+    code = "for is 5\nprint for"
+    self.assertEqual(list(range(2, hedy.HEDY_MAX_LEVEL + 1)), hedy.possible_levels(code))
+
+  def test_valid_levels(self):
+    self.assertEqual([1], hedy.valid_levels("ask wat?\necho hoi"))
+    self.assertEqual([6], hedy.valid_levels("repeat 3 times print 'hi'"))
+    self.assertEqual(list(range(11, hedy.HEDY_MAX_LEVEL + 1)), hedy.valid_levels("print('hallo')"))
+
+  def test_valid_levels_of_invalid_program(self):
+    self.assertEqual([], hedy.valid_levels("print _ hallo"))
+
+  def test_preprocessing_is_shared(self):
+    detector = hedy.LevelDetector("naam is Hedy\nprint naam")
+    self.assertEqual(list(range(2, 11)), detector.valid_levels())
+    self.assertEqual(3, len(detector.preprocessed))
+
+  def test_lowest_and_highest_valid_level(self):
+    detector = hedy.LevelDetector("naam is Hedy\nprint naam")
+    self.assertEqual(2, detector.lowest_valid_level())
+    self.assertEqual(10, detector.highest_valid_level())
+    self.assertEqual(4, detector.highest_valid_level(below=5))
+    self.assertIsNone(detector.highest_valid_level(below=2))
+
+  def test_wrong_level_more_than_one_level_lower(self):
+    # there is no repeat at levels 8 and 9, so level 7 is the closest level to try
+    code = "repeat 3 times\n    print 'hi'"
+    with self.assertRaises(hedy.WrongLevelException) as context:
+      hedy.transpile(code, 10)
+    self.assertEqual(7, context.exception.arguments['working_level'])
+    self.assertEqual(hedy.transpile(code, 7).code, context.exception.arguments['correct_code'])
+
+  def test_wrong_level_search_parses_one_lower_level(self):
+    # level 9 allows the keywords of this program, so level 8 is not tried
+    detector = hedy.LevelDetector("for i in range 1 to 3\n    print i")
+    self.assertIsNone(detector.highest_valid_level(below=10, lowest=7, tries=1))
+    self.assertEqual([9], list(detector.results))
+    self.assertEqual(8, detector.highest_valid_level(below=10, lowest=7))
@@ -0,0 +1,258 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import hedy
+import lark
+import utils
+
+
+class TestsParserModes(unittest.TestCase):
+
+  def setUp(self):
+    self.saved_modes = dict(hedy.PARSER_MODES)
+    hedy.PARSER_CACHE.clear()
+
+  def tearDown(self):
+    hedy.PARSER_MODES.clear()
+    hedy.PARSER_MODES.update(self.saved_modes)
+    hedy.PARSER_CACHE.clear()
+    hedy.LALR_CONFLICTS.clear()
+
+  def test_default_mode_is_earley(self):
+    parser = hedy.get_parser(3)
+    self.assertEqual('earley', parser.options.parser)
+
+  def test_lalr_mode_for_conflict_free_grammar(self):
+    hedy.PARSER_MODES[1] = 'auto'
+    parser = hedy.get_parser(1)
+    self.assertEqual('lalr', parser.options.parser)
+    self.assertNotIn(1, hedy.LALR_CONFLICTS)
+
+  def test_lalr_mode_falls_back_to_earley_on_conflicts(self):
+    hedy.PARSER_MODES[6] = 'auto'
+    parser = hedy.get_parser(6)
+    self.assertEqual('earley', parser.options.parser)
+    self.assertIn('var', hedy.LALR_CONFLICTS[6])
+    self.assertIn('var_access', hedy.LALR_CONFLICTS[6])
+
+  def test_fallback_parser_still_transpiles(self):
+    hedy.PARSER_MODES[2] = 'lalr'
+    result = hedy.transpile("naam is Hedy\nprint naam", 2)
+    self.assertEqual("naam = 'Hedy'\nprint(f'{naam}')", result.code)
+
+  def test_conflicting_rules_strips_generated_rules(self):
+    message = ("Reduce/Reduce collision in Terminal('$END') between the following rules: \n"
+               "\t- <__ask_plus_0 : __ask_plus_0 _SPACE>\n"
+               "\t- <__ask_no_quotes_star_1 : _SPACE>\n"
+               "\t- <var : NAME>\n")
+    self.assertEqual(['ask', 'ask_no_quotes', 'var'], hedy.conflicting_rules(message))
+
+  def test_unknown_mode(self):
+    hedy.PARSER_MODES[1] = 'cyk'
+    with self.assertRaises(ValueError):
+      hedy.get_parser(1)
+
+
+class TestsParserCache(unittest.TestCase):
+
+  def setUp(self):
+    self.saved_create_parser = hedy.create_parser
+    self.saved_debug_mode = utils.is_debug_mode()
+    self.saved_artifact = hedy.PARSER_ARTIFACT
+    hedy.PARSER_CACHE.clear()
+
+  def tearDown(self):
+    hedy.create_parser = self.saved_create_parser
+    utils.set_debug_mode(self.saved_debug_mode)
+    hedy.PARSER_ARTIFACT = self.saved_artifact
+    hedy.PARSER_CACHE.clear()
+
+  def test_concurrent_callers_build_parser_once(self):
+    builds = []
+    def slow_create_parser(grammar, level, mode):
+      builds.append(level)
+      time.sleep(0.2)
+      return self.saved_create_parser(grammar, level, mode)
+    hedy.create_parser = slow_create_parser
+    hedy.PARSER_ARTIFACT = {}  # no prebuilt parsers, so the parser is really built
+    waits = hedy.PARSER_WAITS
+
+    parsers = []
+    threads = [threading.Thread(target=lambda: parsers.append(hedy.get_parser(5))) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual([5], builds)
+    self.assertEqual(4, len(parsers))
+    self.assertTrue(all(parser is parsers[0] for parser in parsers))
+    self.assertEqual(waits + 3, hedy.PARSER_WAITS)
+
+  def test_changed_grammar_rebuilds_parser_in_debug_mode(self):
+    parser = hedy.get_parser(3)
+    # as if the grammar files changed on disk since the parser was built
+    hedy.PARSER_CACHE['3'] = ('old grammar', 'earley', parser)
+
+    utils.set_debug_mode(False)
+    self.assertIs(parser, hedy.get_parser(3))
+    utils.set_debug_mode(True)
+    rebuilt = hedy.get_parser(3)
+    self.assertIsNot(parser, rebuilt)
+    self.assertIs(rebuilt, hedy.get_parser(3))
+
+
+class TestsParserArtifact(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    # building the parsers for all levels is slow, so we only do it once
+    cls.directory = tempfile.TemporaryDirectory()
+    cls.filename = os.path.join(cls.directory.name, 'parsers.pickle')
+    hedy.save_parser_artifact(cls.filename)
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.directory.cleanup()
+
+  def setUp(self):
+    self.saved_artifact = hedy.PARSER_ARTIFACT
+    hedy.PARSER_CACHE.clear()
+
+  def tearDown(self):
+    hedy.PARSER_ARTIFACT = self.saved_artifact
+    hedy.PARSER_CACHE.clear()
+
+  def load(self, filename=None):
+    hedy.PARSER_ARTIFACT = None
+    return hedy.load_parser_artifact(filename or self.filename)
+
+  def test_missing_artifact(self):
+    self.assertEqual({}, self.load(os.path.join(self.directory.name, 'missing.pickle')))
+    self.assertIsNone(hedy.load_prebuilt_parser(1, hedy.create_grammar(1), 'earley'))
+
+  def test_prebuilt_parser_round_trip(self):
+    self.assertEqual(set(range(1, hedy.HEDY_MAX_LEVEL + 1)), set(self.load().keys()))
+
+    parser = hedy.load_prebuilt_parser(4, hedy.create_grammar(4), 'earley')
+    self.assertIsNotNone(parser)
+    result = hedy.transpile("naam is ask 'hoe heet jij?'\nprint naam", 4)
+    self.assertEqual(hedy.get_parser(4).parse("print 'hallo'\n"), parser.parse("print 'hallo'\n"))
+    self.assertEqual("naam = input('hoe heet jij?')\nprint(f'{naam}')", result.code)
+
+  def test_stale_artifact_is_ignored(self):
+    self.load()
+    grammar = hedy.create_grammar(2) + '\nextra: "extra"'
+    self.assertIsNone(hedy.load_prebuilt_parser(2, grammar, 'earley'))
+    self.assertIsNone(hedy.load_prebuilt_parser(2, hedy.create_grammar(2), 'lalr'))
+
+  def test_artifact_with_missing_class_is_ignored(self):
+    # a parser pickled before a class it refers to was renamed or moved
+    grammar = hedy.create_grammar(2)
+    for parser in [b'chedy\nNoSuchTree\n.', b'cno_such_module\nTree\n.']:
+      hedy.PARSER_ARTIFACT = {2: {'hash': hedy.grammar_hash(grammar, 'earley'), 'conflicts': None, 'parser': parser}}
+      with self.assertLogs('hedy', 'WARNING'):
+        self.assertIsNone(hedy.load_prebuilt_parser(2, grammar, 'earley'))
+    self.assertIsNotNone(hedy.get_parser(2))
+
+
+class TestsGrammar(unittest.TestCase):
+
+  def test_merge_grammars_overrides_and_adds_rules(self):
+    grammar_1 = "// comment\nprint: _PRINT text\nask: _ASK text\n"
+    grammar_2 = "ask: _ASK (_SPACE text)?\necho: _ECHO text"
+    expected = "ask: _ASK (_SPACE text)?\necho: _ECHO text\nprint: _PRINT text"
+    self.assertEqual(expected, hedy.merge_grammars(grammar_1, grammar_2))
+
+  def test_create_grammar_is_memoized(self):
+    self.assertIs(hedy.create_grammar(12), hedy.create_grammar(12))
+
+  def test_create_grammar_builds_on_previous_level(self):
+    rules_11, _ = hedy.get_grammar_for_level(11)
+    rules_12, _ = hedy.get_grammar_for_level(12)
+    _, additions = hedy.read_grammar_file('level12-Additions.lark')
+    for name, rule in rules_11.items():
+      self.assertEqual(additions.get(name, rule), rules_12[name])
+
+
+class TestsTreeAnalysis(unittest.TestCase):
+
+  def test_analysis_matches_separate_transformers(self):
+    code = "dieren is ask 'welk dier?'\nif dieren is hond print 'woef' else print 'miauw'\nforward 50\n"
+    for level in [4, 5]:
+      program_root = hedy.get_parser(level).parse(code).children[0]
+      analysis = hedy.TreeAnalysis(level).analyse(program_root)
+      ast = hedy.ExtractAST().transform(program_root)
+
+      self.assertEqual(ast, analysis.ast)
+      self.assertEqual(hedy.AllAssignmentCommands().transform(ast), analysis.lookup)
+      self.assertEqual(hedy.AllAssignmentCommandsHashed().transform(ast), analysis.hashed_lookup)
+      self.assertEqual(hedy.IsValid().transform(program_root), analysis.is_valid)
+      self.assertEqual(hedy.IsComplete(level).transform(program_root), analysis.is_complete)
+      self.assertEqual(True, analysis.has_turtle)
+
+
+class TestsSymbolTable(unittest.TestCase):
+
+  def test_lookup_contains_names_and_hashes(self):
+    code = "dieren is hond, kat\nfor is ask 'hoe heet jij?'\nprint dieren at random\n"
+    analysis = hedy.TreeAnalysis(4).analyse(hedy.get_parser(4).parse(code).children[0])
+    lookup = hedy.SymbolTable(analysis.lookup + analysis.hashed_lookup)
+
+    self.assertIn('dieren', lookup)
+    self.assertIn('for', lookup)
+    self.assertIn(hedy.hash_var('for'), lookup)
+    self.assertIn('random.choice(dieren)', lookup)
+    self.assertNotIn('hond', lookup)
+
+  def test_hashed_names_are_remembered(self):
+    self.assertEqual('vd55669822f1a8cf72ec1911e462a54eb', hedy.hash_var('for'))
+    self.assertIs(hedy.hash_var('for'), hedy.hash_var('for'))
+    self.assertEqual('naam', hedy.hash_var('naam'))
+
+
+def with_lark_dispatch(transformer_class):
+  # the same transformer, finding its methods the way lark does
+  class LarkDispatch(transformer_class):
+    _call_userfunc = lark.Transformer._call_userfunc
+    _call_userfunc_token = lark.Transformer._call_userfunc_token
+  return LarkDispatch
+
+
+class TestsHedyTransformer(unittest.TestCase):
+
+  def test_same_results_as_lark_dispatch(self):
+    code = "dieren is ask 'welk dier?'\nif dieren is hond print 'woef' else print 'miauw'\nforward 50\nprnt dieren\n"
+    program_root = hedy.get_parser(4).parse(code).children[0]
+    ast = hedy.ExtractAST().transform(program_root)
+
+    for transformer_class, args, tree in [(hedy.ExtractAST, [], program_root), (hedy.IsValid, [], program_root),
+                                          (hedy.IsComplete, [4], program_root), (hedy.UsesTurtle, [], program_root),
+                                          (hedy.AllAssignmentCommands, [], ast), (hedy.AllAssignmentCommandsHashed, [], ast)]:
+      expected = with_lark_dispatch(transformer_class)(*args).transform(tree)
+      self.assertEqual(expected, transformer_class(*args).transform(tree), transformer_class.__name__)
+
+  def test_subclass_methods_override_the_table(self):
+    self.assertIs(hedy.IsValid.program, hedy.IsValid._rule_methods['program'])
+    self.assertIs(hedy.Filter.program, hedy.IsComplete._rule_methods['program'])
+    self.assertIs(hedy.ConvertToPython_2.print, hedy.TRANSPILER_LOOKUP[2]._rule_methods['print'])
+
+
+class TestsHedyTree(unittest.TestCase):
+
+  def test_parsers_and_transformers_build_hedy_trees(self):
+    program_root = hedy.get_parser(4).parse("print 'hallo'\n").children[0]
+    ast = hedy.ExtractAST().transform(program_root)
+    for tree in [program_root, ast]:
+      self.assertEqual([hedy.HedyTree], list({type(node) for node in nodes(tree)}))
+    self.assertFalse(hasattr(ast, '__dict__'))
+    self.assertEqual("program\n  command\n    print\n      text\t'hallo'\n", ast.pretty())
+
+
+def nodes(tree):
+  yield tree
+  for child in tree.children:
+    if isinstance(child, hedy.HedyTree):
+      yield from nodes(child)
@@ -0,0 +1,100 @@
+import unittest
+import hedy
+import sandbox
+
+
+class TestsSandbox(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    limits = sandbox.Limits(cpu_seconds=1, wall_seconds=5, memory_bytes=64 * 1024 * 1024, output_bytes=1000)
+    cls.pool = sandbox.SandboxPool(workers=2, limits=limits, isolate=sandbox.can_isolate())
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.pool.close()
+
+  def test_ask_gets_scripted_answers(self):
+    result = self.pool.run("naam is ask 'Hoe heet jij?'\nprint 'Hallo ' naam", 4, answers=['Hedy'])
+    self.assertEqual(sandbox.ExecutionResult('Hoe heet jij?Hallo Hedy\n', None, None), result)
+
+    result = self.pool.run("naam is ask 'Hoe heet jij?'\nprint 'Hallo ' naam", 4)
+    self.assertEqual(sandbox.NOT_ENOUGH_ANSWERS, result.error)
+
+  def test_limits(self):
+    self.assertEqual(sandbox.CPU_TIME_EXCEEDED, self.pool.run_python('while True: pass').error)
+    self.assertEqual(sandbox.MEMORY_EXCEEDED, self.pool.run_python("x = 'a' * (512 * 1024 * 1024)").error)
+    self.assertEqual(sandbox.OUTPUT_EXCEEDED, self.pool.run_python("while True: print('hallo')").error)
+    # the workers can still run programs after that
+    self.assertEqual('3\n', self.pool.run_python('print(1 + 2)').output)
+
+  def test_turtle_programs_return_their_trace(self):
+    result = self.pool.run('forward 100\nturn left\nforward 50', 1)
+    self.assertIsNone(result.error)
+    self.assertEqual([('forward', 100.0), ('left', 90.0), ('forward', 50.0)], result.turtle.trace)
+
+  def test_run_many_keeps_order(self):
+    results = self.pool.run_many([("print 'een'", 4, ()), ("prnt 'twee'", 4, ()), ("print 'drie'", 4, ())])
+    self.assertEqual('een\n', results[0].output)
+    self.assertIsInstance(results[1], hedy.InvalidCommandException)
+    self.assertEqual('drie\n', results[2].output)
+
+
+class TestsSandboxWallTime(unittest.TestCase):
+
+  def test_worker_that_takes_too_long_is_replaced(self):
+    limits = sandbox.Limits(cpu_seconds=60, wall_seconds=0.5, memory_bytes=64 * 1024 * 1024, output_bytes=1000)
+    with sandbox.SandboxPool(workers=1, limits=limits, isolate=sandbox.can_isolate()) as pool:
+      self.assertEqual(sandbox.WALL_TIME_EXCEEDED, pool.run_python('while True: pass').error)
+      self.assertEqual('hallo\n', pool.run_python("print('hallo')").output)
+      self.assertEqual(1, len(pool.workers))
+
+
+# gets the os module and the real builtins the way an attacker would
+ESCAPE = """
+for c in ().__class__.__base__.__subclasses__():
+    if c.__name__ == 'catch_warnings':
+        real_builtins = c()._module.__builtins__
+os = real_builtins['__import__']('os')
+"""
+
+
+@unittest.skipUnless(sandbox.can_isolate(), 'isolating the workers needs root')
+class TestsSandboxIsolation(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    cls.pool = sandbox.SandboxPool(workers=2)
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.pool.close()
+
+  def run_escape(self, code):
+    return self.pool.run_python(ESCAPE + code)
+
+  def test_workers_run_as_users_of_their_own(self):
+    uids = {self.run_escape('print(os.getuid(), os.getgid())').output for _ in range(4)}
+    self.assertTrue(uids <= {'200000 200000\n', '200001 200001\n'}, uids)
+
+  def test_no_files(self):
+    self.assertEqual('False\n', self.run_escape("print(os.path.exists('/etc/passwd'))").output)
+    # every call that needs a new file descriptor fails, even reading the (empty) root directory
+    self.assertTrue(self.run_escape("os.listdir('/')").error.startswith('OSError'))
+    self.assertTrue(self.run_escape("real_builtins['open']('/x', 'w')").error.startswith('OSError'))
+
+  def test_no_environment(self):
+    self.assertEqual('0\n', self.run_escape('print(len(os.environ))').output)
+
+  def test_no_sockets(self):
+    # the multiprocessing module of the worker has already imported socket
+    result = self.run_escape("import_ = real_builtins['__import__']\nimport_('socket').socket()")
+    self.assertTrue(result.error.startswith('OSError'), result.error)
+
+  def test_no_processes(self):
+    self.assertTrue(self.run_escape('os.fork()').error.startswith('BlockingIOError'))
+
+  def test_limits_can_not_be_raised(self):
+    result = self.run_escape("resource = real_builtins['__import__']('resource')\n"
+                             "resource.setrlimit(resource.RLIMIT_NOFILE, (1024, 1024))")
+    self.assertTrue(result.error.startswith('ValueError'), result.error)
@@ -0,0 +1,171 @@
+import argparse
+import gc
+import sys
+import textwrap
+import time
+import unittest
+import hedy
+
+# Measures how the time it takes to transpile a program grows with its length. Timing
+# depends too much on the machine for the unit tests, they count the lines the parser
+# gets instead, which is what the time grows with. To run the benchmark (100, 1000 and
+# 10000 lines for every level, this takes a long time):
+#
+#   PYTHONPATH=. python tests/tests_scaling.py --sizes 100 1000 10000
+
+# (first level, last level, program) for programs of a few lines, a generated program
+# repeats all snippets that are valid at its level
+SNIPPETS = [
+  (1, 2, "print hallo\nforward 50"),
+  (2, 10, "naam is Hedy\nprint 'hallo ' naam"),
+  (4, 6, "getal is 5\nif getal is 5 print 'ja' else print 'nee'"),
+  (6, 6, "repeat 2 times print 'hallo'"),
+  (7, 7, "repeat 2 times\n    print 'hallo'"),
+  (8, 8, "for i in range 1 to 3\n    print 'getal ' i"),
+  (9, 10, "getal is 5\nif getal is 5:\n    print 'ja'\nelse:\n    print 'nee'"),
+  (11, 22, "for i in range(1, 3):\n    print('getal ' i)"),
+  (11, 19, "getal is 5\nprint('getal ' getal)"),
+  (15, 22, "# commentaar"),
+  (17, 19, "getal is 0\nwhile getal < 3:\n    getal is getal + 1"),
+  (20, 22, "getal = 0\nwhile getal < 3:\n    getal = getal + 1\nprint(getal)"),
+  (20, 22, "dieren = ['hond', 'kat']\nprint(dieren[random])"),
+]
+
+# transpiling n times as many lines may take at most this factor times n as long
+MAX_SCALING_FACTOR = 2.0
+
+
+def generate_program(level, number_of_lines):
+  # a program of at least number_of_lines lines, made of whole snippets
+  snippets = [snippet for first, last, snippet in SNIPPETS if first <= level <= last]
+  program = []
+  while len(program) < number_of_lines:
+    program += snippets[len(program) % len(snippets)].split('\n')
+  return '\n'.join(program)
+
+
+def transpile_time(code, level):
+  gc.collect()
+  start = time.perf_counter()
+  hedy.transpile_uncached(code, level)
+  return time.perf_counter() - start
+
+
+def scaling(level, sizes, repeat=1):
+  # returns [(number of lines, seconds, seconds per line)] for programs of the given sizes
+  hedy.transpile_uncached(generate_program(level, 10), level)  # building the parser is not part of the benchmark
+  programs = [generate_program(level, number_of_lines) for number_of_lines in sizes]
+  # we take the fastest of a few runs, which is the one least disturbed by other processes,
+  # and alternate between the programs so a disturbance does not hit just one of them
+  times = [[] for _ in programs]
+  for _ in range(repeat):
+    for code, program_times in zip(programs, times):
+      program_times.append(transpile_time(code, level))
+  results = []
+  for code, program_times in zip(programs, times):
+    number_of_lines = code.count('\n') + 1
+    seconds = min(program_times)
+    results.append((number_of_lines, seconds, seconds / number_of_lines))
+  return results
+
+
+def parsed_lines(program, level):
+  # transpiles a program and returns the number of lines of every text the parser got
+  original = hedy.parse_program
+  lines = []
+
+  def parse_program(parser, input_string, level, line_offset=0):
+    lines.append(input_string.count('\n') + 1)
+    return original(parser, input_string, level, line_offset)
+
+  hedy.parse_program = parse_program
+  try:
+    hedy.transpile_uncached(program, level)
+  except hedy.HedyException:
+    pass
+  finally:
+    hedy.parse_program = original
+  return lines
+
+
+def with_error(program):
+  # the program with an invalid command halfway
+  lines = program.split('\n')
+  lines.insert(len(lines) // 2, "prnt 'hallo'")
+  return '\n'.join(lines)
+
+
+class TestsScaling(unittest.TestCase):
+
+  def setUp(self):
+    # the programs of these tests may be longer than we transpile on the server
+    self.max_lines = hedy.MAX_LINES
+    hedy.MAX_LINES = 1000
+
+  def tearDown(self):
+    hedy.MAX_LINES = self.max_lines
+
+  def test_generated_programs_are_valid(self):
+    for level in range(1, hedy.HEDY_MAX_LEVEL + 1):
+      code = generate_program(level, 30)
+      self.assertGreaterEqual(len(code.split('\n')), 30)
+      hedy.transpile_uncached(code, level)
+
+  def test_long_program_is_parsed_in_pieces(self):
+    code = hedy.preprocess_program(generate_program(17, 2 * hedy.PARSE_WHOLE_LINES), 17)
+    parser = hedy.get_parser(17)
+    self.assertGreater(len(hedy.split_into_pieces(code, 17)), 1)
+    program_root, _ = hedy.parse_in_pieces(parser, hedy.TreeAnalysis(17), code, 17)
+    self.assertEqual(hedy.parse_program(parser, code, 17), program_root)
+
+  def test_parsing_scales_linearly(self):
+    # counting the lines the parser gets instead of timing it: a program is parsed in pieces
+    # of bounded size, and the parser does not get more lines per line of a longer program,
+    # also not for a program with an error, which is parsed again at other levels
+    for level in [4, 17]:
+      for make_program in [generate_program, lambda level, number_of_lines: with_error(generate_program(level, number_of_lines))]:
+        short = parsed_lines(make_program(level, 3 * hedy.PARSE_PIECE_LINES), level)
+        long = parsed_lines(make_program(level, 12 * hedy.PARSE_PIECE_LINES), level)
+        self.assertLessEqual(max(long), 4 * hedy.PARSE_PIECE_LINES)
+        self.assertLessEqual(sum(long) / 4, 1.5 * sum(short))
+
+  def test_parse_error_in_later_piece(self):
+    program = generate_program(20, 2 * hedy.PARSE_WHOLE_LINES)
+    with self.assertRaises(hedy.ParseException) as context:
+      hedy.transpile_uncached(program + "\nprint('hallo' ,", 20)
+    self.assertEqual(program.count('\n') + 2, context.exception.location[0])
+
+  def test_piece_that_is_only_valid_in_the_whole_program(self):
+    # the if and else are the first lines of the last piece, on their own
+    # the else is an invalid command
+    program = "\n".join(["print 'x'"] * 99) + textwrap.dedent("""
+      password is ask 'What is the password?'
+      if password is SECRET print 'Correct!'
+      else print 'Wrong!'""")
+    code = hedy.preprocess_program(program, 4)
+    self.assertEqual("if password is SECRET print 'Correct!'\nelse print 'Wrong!'", hedy.split_into_pieces(code, 4)[-1])
+
+    result = hedy.transpile_uncached(program, 4)
+    self.assertTrue(result.code.endswith("else:\n  print(f'Wrong!')"))
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Measure how transpile time grows with the length of a program.')
+  parser.add_argument('--levels', type=int, nargs='+', default=range(1, hedy.HEDY_MAX_LEVEL + 1))
+  parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+  args = parser.parse_args()
+
+  hedy.MAX_LINES = 2 * max(args.sizes)
+  linear = True
+  for level in args.levels:
+    results = scaling(level, args.sizes)
+    for number_of_lines, seconds, seconds_per_line in results:
+      print(f'level {level:2} {number_of_lines:6} lines {seconds:8.2f}s {1000 * seconds_per_line:6.2f}ms per line')
+    if results[-1][2] > MAX_SCALING_FACTOR * results[0][2]:
+      print(f'level {level} does not scale linearly')
+      linear = False
+  sys.exit(0 if linear else 1)
+
+
+if __name__ == '__main__':
+  main()
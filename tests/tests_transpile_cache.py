@@ -0,0 +1,168 @@
+import collections
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import hedy
+
+
+class TestsTranspileCache(unittest.TestCase):
+
+  def setUp(self):
+    hedy.TRANSPILE_CACHE.clear()
+    hedy.PREBAKED = {}
+    self.counters = collections.Counter()
+    hedy.COUNTER_CALLBACK = lambda name: self.counters.update([name])
+
+  def tearDown(self):
+    hedy.TRANSPILE_CACHE.clear()
+    hedy.PREBAKED = None
+    hedy.COUNTER_CALLBACK = None
+
+  def test_repeated_program_is_cached(self):
+    first = hedy.transpile("print 'hallo'", 4)
+    second = hedy.transpile("print 'hallo'", 4)
+
+    self.assertIs(first, second)
+    self.assertEqual(1, self.counters['transpile_cache_miss'])
+    self.assertEqual(1, self.counters['transpile_cache_hit'])
+
+  def test_key_includes_level_and_normalizes_newlines(self):
+    key = hedy.TranspileCache.key("print hallo\r\nprint hoi", 1)
+    self.assertEqual(key, hedy.TranspileCache.key("print hallo\nprint hoi", 1))
+    self.assertNotEqual(key, hedy.TranspileCache.key("print hallo\nprint hoi", 2))
+
+  def test_errors_are_cached_as_copies(self):
+    for i in range(2):
+      with self.assertRaises(hedy.InvalidCommandException) as context:
+        hedy.transpile("prnt 'hallo'", 3)
+      self.assertEqual('print', context.exception.arguments['guessed_command'])
+      # callers may modify the exception, this must not change the cached one
+      context.exception.arguments['guessed_command'] = 'changed'
+    self.assertEqual(1, len(hedy.TRANSPILE_CACHE))
+
+  def test_lru_eviction(self):
+    cache = hedy.TranspileCache(max_bytes=3 * (hedy.TranspileCache.ENTRY_OVERHEAD + 1))
+    for name in ['a', 'b', 'c']:
+      cache.put(name, hedy.ParseResult(code=name, has_turtle=False))
+    cache.get('a')
+    cache.put('d', hedy.ParseResult(code='d', has_turtle=False))
+
+    self.assertIsNone(cache.get('b'))
+    self.assertEqual('a', cache.get('a').code)
+    self.assertEqual(1, cache.evictions)
+    self.assertLessEqual(cache.size, cache.max_bytes)
+
+  def test_resize_evicts_least_recently_used(self):
+    cache = hedy.TranspileCache(max_bytes=3 * (hedy.TranspileCache.ENTRY_OVERHEAD + 1))
+    for name in ['a', 'b', 'c']:
+      cache.put(name, hedy.ParseResult(code=name, has_turtle=False))
+    cache.resize(hedy.TranspileCache.ENTRY_OVERHEAD + 1)
+
+    self.assertEqual(1, len(cache))
+    self.assertEqual('c', cache.get('c').code)
+
+  def test_import_has_no_side_effects(self):
+    # f.e. the querylog starts a thread and claims the log files other processes left behind
+    code = "import sys, hedy; print(sorted(m for m in sys.modules if m.startswith('website')))"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    self.assertEqual('[]', output.strip())
+
+
+class TestsPrebakedTranspilations(unittest.TestCase):
+
+  def setUp(self):
+    hedy.TRANSPILE_CACHE.clear()
+    self.directory = tempfile.TemporaryDirectory()
+    self.filename = os.path.join(self.directory.name, 'prebaked.pickle')
+    self.counters = collections.Counter()
+    hedy.COUNTER_CALLBACK = lambda name: self.counters.update([name])
+
+  def tearDown(self):
+    hedy.TRANSPILE_CACHE.clear()
+    hedy.PREBAKED = None
+    hedy.COUNTER_CALLBACK = None
+    self.directory.cleanup()
+
+  def test_prebaked_program_is_not_parsed(self):
+    failures = hedy.save_prebaked_transpilations([(4, "print 'hallo'"), (4, "prnt 'hallo'")], self.filename)
+    hedy.PREBAKED = None
+    hedy.load_prebaked_transpilations(self.filename)
+
+    result = hedy.transpile("print 'hallo'", 4)
+
+    self.assertEqual(1, self.counters['transpile_prebaked_hit'])
+    self.assertNotIn('transpile_cache_miss', self.counters)
+    self.assertEqual(hedy.transpile_uncached("print 'hallo'", 4), result)
+    # programs that don't transpile are reported and left out
+    self.assertEqual([(4, "prnt 'hallo'")], [(level, code) for level, code, ex in failures])
+    self.assertEqual(1, len(hedy.PREBAKED))
+
+  def test_stale_table_is_ignored(self):
+    hedy.save_prebaked_transpilations([(4, "print 'hallo'")], self.filename)
+    hedy.PREBAKED = None
+    original = hedy.transpiler_hash
+    hedy.transpiler_hash = lambda: 'another transpiler'
+    try:
+      self.assertEqual({}, hedy.load_prebaked_transpilations(self.filename))
+    finally:
+      hedy.transpiler_hash = original
+
+
+class TestsTranspileTimeout(unittest.TestCase):
+
+  def setUp(self):
+    hedy.TRANSPILE_CACHE.clear()
+
+  def tearDown(self):
+    hedy.TRANSPILE_CACHE.clear()
+
+  def test_slow_program_times_out(self):
+    code = "\n".join(["print 'hallo'"] * 90)
+    with self.assertRaises(hedy.TranspileTimeoutException) as context:
+      hedy.transpile(code, 4, timeout=0.01)
+    self.assertEqual(0.01, context.exception.arguments['seconds'])
+
+    # a timeout is not cached, with more time the program transpiles fine
+    self.assertEqual(0, len(hedy.TRANSPILE_CACHE))
+    self.assertEqual(90, len(hedy.transpile(code, 4, timeout=60).code.split('\n')))
+
+  def test_timeout_while_looking_for_the_right_level_is_not_cached(self):
+    code = "repeat 3 times\n    print 'hi'"
+    original = hedy.transpile_prepared
+    calls = []
+
+    def transpile_prepared(input_string, level):
+      # the deadline runs out after the first parse, at the level of the program
+      calls.append(level)
+      if len(calls) > 1:
+        raise hedy.TranspileTimeoutException(seconds=0.01)
+      return original(input_string, level)
+
+    hedy.transpile_prepared = transpile_prepared
+    try:
+      with self.assertRaises(hedy.TranspileTimeoutException):
+        hedy.transpile(code, 10)
+    finally:
+      hedy.transpile_prepared = original
+    self.assertEqual(0, len(hedy.TRANSPILE_CACHE))
+
+    with self.assertRaises(hedy.WrongLevelException) as context:
+      hedy.transpile(code, 10)
+    self.assertEqual(7, context.exception.arguments['working_level'])
+
+  def test_deadline_is_only_checked_during_the_call(self):
+    with hedy.transpile_deadline(0):
+      with self.assertRaises(hedy.TranspileTimeoutException):
+        hedy.check_deadline()
+    hedy.check_deadline()
+    self.assertEqual("print 'hallo'", hedy.deadline_text("print 'hallo'"))
+    self.assertIs(str, type(hedy.deadline_text("print 'hallo'")))
+
+  def test_inner_deadline_does_not_extend_outer_deadline(self):
+    with hedy.transpile_deadline(0):
+      with hedy.transpile_deadline(60):
+        with self.assertRaises(hedy.TranspileTimeoutException):
+          hedy.check_deadline()
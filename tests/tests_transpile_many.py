@@ -0,0 +1,29 @@
+import unittest
+import hedy
+
+
+class TestsTranspileMany(unittest.TestCase):
+  items = [("print 'hallo'", 3), ("prnt 'hallo'", 3), ("naam is Hedy\nprint naam", 2)] * 5
+
+  def test_results_in_order(self):
+    results = list(hedy.transpile_many(self.items, workers=2, batch_size=4))
+    self.assertEqual(list(range(len(self.items))), [r.index for r in results])
+    self.assertEqual("print(f'hallo')", results[0].result.code)
+    self.assertEqual("naam = 'Hedy'\nprint(f'{naam}')", results[2].result.code)
+
+  def test_errors_are_returned_per_item(self):
+    results = list(hedy.transpile_many(self.items, workers=2, batch_size=4))
+    error = results[1].error
+    self.assertIsNone(results[1].result)
+    self.assertIsInstance(error, hedy.InvalidCommandException)
+    self.assertEqual('print', error.arguments['guessed_command'])
+    self.assertIsNone(results[0].error)
+
+  def test_as_completed(self):
+    results = list(hedy.transpile_many(self.items, workers=2, ordered=False, batch_size=3))
+    self.assertEqual(list(range(len(self.items))), sorted(r.index for r in results))
+
+  def test_in_process(self):
+    results = list(hedy.transpile_many(self.items[:3], workers=0))
+    self.assertEqual(["print(f'hallo')", None, "naam = 'Hedy'\nprint(f'{naam}')"],
+                     [r.result.code if r.result else None for r in results])
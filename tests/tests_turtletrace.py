@@ -0,0 +1,37 @@
+import contextlib
+import io
+import time
+import unittest
+import hedy
+
+
+class TestsTurtleTrace(unittest.TestCase):
+
+  def test_execute_records_turtle_commands(self):
+    turtle = hedy.execute('forward 100\nturn left\nforward 50\nturn\nforward 20', 1)
+
+    self.assertEqual([('forward', 100.0), ('left', 90.0), ('forward', 50.0), ('right', 90.0), ('forward', 20.0)],
+                     turtle.trace)
+    self.assertEqual((170.0, 150.0), turtle.position())
+    self.assertEqual((50.0, 100.0, 170.0, 150.0), turtle.bounding_box())
+
+  def test_variables_of_early_levels_are_numbers_in_strings(self):
+    turtle = hedy.execute('afstand is 100\nforward afstand\nturn 45\nforward afstand', 2)
+
+    self.assertEqual([('forward', 100.0), ('right', 45.0), ('forward', 100.0)], turtle.trace)
+    self.assertEqual((50.0, 29.29, 220.71, 100.0), turtle.bounding_box())
+
+  def test_turtle_programs_do_not_sleep(self):
+    program = '\n'.join(['forward 10', 'turn right'] * 48)
+    start = time.perf_counter()
+    turtle = hedy.execute(program, 1)
+
+    # in the browser every forward sleeps 0.1s
+    self.assertLess(time.perf_counter() - start, 2)
+    self.assertEqual(96, len(turtle.trace))
+    self.assertEqual((50.0, 100.0), turtle.position())
+
+  def test_programs_without_turtle_return_none(self):
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+      self.assertIsNone(hedy.execute('print hallo', 1))
+    self.assertEqual('hallo\n', output.getvalue())
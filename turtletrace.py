@@ -0,0 +1,66 @@
+"""A turtle without a screen, to run Hedy programs that use the turtle outside of the browser.
+
+In the browser, Skulpt draws what a program does with the turtle, and the
+transpiler puts a time.sleep(0.1) after every forward so kids can see it
+happen. Outside of the browser we only want to know what the program drew:
+the HeadlessTurtle records the commands it gets in a trace and keeps track
+of where it went, and the time module programs get here does not sleep. So
+a turtle program runs as fast as any other program, and two runs can be
+compared by their traces.
+
+    turtle = turtletrace.HeadlessTurtle()
+    exec(hedy.transpile(code, level).code, turtletrace.program_globals(turtle))
+    turtle.trace, turtle.bounding_box()
+"""
+import math
+import random
+import types
+
+# where the turtle starts, facing right, like the code /parse puts in front of turtle programs in app.py
+START = (50.0, 100.0)
+
+# the digits of the positions in a bounding box, so rounding errors don't make equal drawings differ
+DIGITS = 2
+
+NO_SLEEP = types.SimpleNamespace(sleep=lambda seconds=0: None)
+
+
+class HeadlessTurtle:
+    """Records the forward and turn commands of a program in `trace`, as ('forward', 50.0) and ('right', 90.0)."""
+
+    def __init__(self):
+        self.x, self.y = START
+        self.heading = 0.0
+        self.trace = []
+        self.box = (self.x, self.y, self.x, self.y)
+
+    def forward(self, distance):
+        # Skulpt accepts numbers in strings, and variables of the early levels are strings
+        distance = float(distance)
+        self.trace.append(('forward', distance))
+        self.x += distance * math.cos(math.radians(self.heading))
+        self.y += distance * math.sin(math.radians(self.heading))
+        min_x, min_y, max_x, max_y = self.box
+        self.box = (min(min_x, self.x), min(min_y, self.y), max(max_x, self.x), max(max_y, self.y))
+
+    def right(self, angle):
+        angle = float(angle)
+        self.trace.append(('right', angle))
+        self.heading = (self.heading - angle) % 360
+
+    def left(self, angle):
+        angle = float(angle)
+        self.trace.append(('left', angle))
+        self.heading = (self.heading + angle) % 360
+
+    def position(self):
+        return round(self.x, DIGITS), round(self.y, DIGITS)
+
+    def bounding_box(self):
+        """The smallest rectangle the path of the turtle fits in, as (min x, min y, max x, max y)."""
+        return tuple(round(value, DIGITS) for value in self.box)
+
+
+def program_globals(turtle):
+    """The globals a transpiled program runs with: the turtle as t, and a time module that does not sleep."""
+    return {'random': random, 'time': NO_SLEEP, 't': turtle}
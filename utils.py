@@ -8,7 +8,6 @@ import re
 import string
 import random
 from ruamel import yaml
-from website import querylog
 import commonmark
 commonmark_parser = commonmark.Parser ()
 commonmark_renderer = commonmark.HtmlRenderer ()
@@ -133,6 +132,27 @@ def version():
     commit = os.getenv('HEROKU_SLUG_COMMIT', '????')[0:6]
     return the_date.strftime('%b %d') + f' ({commit})'
 
+def memory_usage(pid='self'):
+    """Return the memory of a process in kB: its RSS, the shared and private part of it and its PSS.
+
+    Shared memory is shared with other processes, like the pages a worker still
+    shares with the gunicorn master it was forked from. PSS divides shared pages
+    over the processes sharing them. Returns None where /proc/<pid>/smaps_rollup
+    is not available (only Linux has it).
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            fields = dict(line.split(':', 1) for line in f.readlines()[1:])
+    except (FileNotFoundError, PermissionError):
+        return None
+    kb = {name: int(value.split()[0]) for name, value in fields.items()}
+    return {
+        'rss': kb['Rss'],
+        'shared': kb['Shared_Clean'] + kb['Shared_Dirty'],
+        'private': kb['Private_Clean'] + kb['Private_Dirty'],
+        'pss': kb['Pss'],
+    }
+
 def valid_email(s):
     return bool (re.match ('^(([a-zA-Z0-9_+\.\-]+)@([\da-zA-Z\.\-]+)\.([a-zA-Z\.]{2,6})\s*)$', s))
 
@@ -32,8 +32,14 @@ class JsonBinLogger:
     def __init__(self, secret_key, collection_id):
         self.secret_key = secret_key
         self.collection_id = collection_id
-        self.queue = queue.Queue()
+        self._start_thread()
+
+        # Threads do not survive a fork(), so a forked process starts its own (see LogQueue)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start_thread)
 
+    def _start_thread(self):
+        self.queue = queue.Queue()
         self.thread = threading.Thread(target=self._run, daemon=True, name='jsonbin_logger')
         self.thread.start()
 
@@ -33,10 +33,24 @@ class LogQueue:
         self.batch_window_s = batch_window_s
         self.transmitter = None
         self.do_print = do_print
+        self._start_writer()
+
+        # Threads do not survive a fork(), f.e. of the gunicorn workers when the app
+        # is preloaded in the master. So a forked process starts its own writer.
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _start_writer(self):
         self.mutex = threading.Lock()
-        self.thread = threading.Thread(target=self._write_thread, name=f'{name}Writer', daemon=True)
+        self.thread = threading.Thread(target=self._write_thread, name=f'{self.name}Writer', daemon=True)
         self.thread.start()
 
+    def _restart_after_fork(self):
+        # The records in the queue are still sent by the parent. Another thread may
+        # have held the mutex during the fork, then it stays locked in the child.
+        self.records_queue = collections.defaultdict(list)
+        self._start_writer()
+
     def add(self, data):
         bucket = div_clip(time.time(), self.batch_window_s)
 
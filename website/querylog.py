@@ -159,7 +159,9 @@ def log_time(name):
 
 def log_counter(name, count=1):
     """Increase the count of something in the currently globally active Log Record."""
-    return THREAD_LOCAL.current_log_record.inc(name, count)
+    if hasattr(THREAD_LOCAL, 'current_log_record'):
+        # Threads that are not serving a request don't have a log record
+        return THREAD_LOCAL.current_log_record.inc(name, count)
 
 
 def timed(fn):
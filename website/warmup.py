@@ -0,0 +1,69 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger('warmup')
+
+
+class Warmup:
+    """Does the slow work a fresh worker would otherwise do during its first requests.
+
+    Building the parser of a level or loading a YAML file takes long enough to
+    notice, so after every deploy and worker restart the first requests were
+    slow. Tasks are added with `add` and run one after the other in a
+    background thread by `start`, `status` reports the progress.
+    """
+
+    def __init__(self):
+        self.tasks = []
+        self.done = 0
+        self.failed = []
+        self.current = None
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    def add(self, name, task):
+        self.tasks.append((name, task))
+
+    def start(self):
+        self.started_at = time.time()
+        thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def run(self):
+        for name, task in self.tasks:
+            self.current = name
+            try:
+                task()
+            except Exception:
+                # a task that fails is done again when it is needed, so we just go on
+                logger.exception('Warm-up task %s failed', name)
+                self.failed.append(name)
+            self.done += 1
+        self.current = None
+        self.finished_at = time.time()
+        logger.info('Warm-up done in %.1fs', self.finished_at - self.started_at)
+        self.finished.set()
+
+    def is_ready(self):
+        """Whether the warm-up is done, or was never started (f.e. in unit tests)."""
+        return self.started_at is None or self.finished.is_set()
+
+    def wait(self, timeout=None):
+        """Wait until the warm-up is done, for at most timeout seconds. Returns whether it is done."""
+        if self.started_at is None:
+            return True
+        return self.finished.wait(timeout)
+
+    def status(self):
+        end = self.finished_at or time.time()
+        return {
+            'ready': self.is_ready(),
+            'done': self.done,
+            'total': len(self.tasks),
+            'current': self.current,
+            'failed': self.failed,
+            'seconds': round(end - self.started_at, 3) if self.started_at else None,
+        }